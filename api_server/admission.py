@@ -0,0 +1,266 @@
+"""
+Admission Control
+=================
+
+Backpressure for the prediction endpoints so one client posting huge or
+bursty batches cannot push latency up for everyone else.
+
+Each admitted request has a cost in "work units" (1 for a single
+prediction, the number of samples for a batch) and must pass three checks:
+
+1. Size: a batch larger than ``MAX_BATCH_SIZE`` is rejected with 413.
+2. Rate: a token bucket per client (an ``X-API-Key`` listed in
+   ``API_KEYS``, otherwise the client IP) refilled at ``RATE_LIMIT_RATE`` units/second up to
+   ``RATE_LIMIT_BURST``; an empty bucket gives 429 with ``Retry-After``.
+3. Load: work already in flight on this host may not exceed
+   ``MAX_INFLIGHT_UNITS``; otherwise the request gets 503 with
+   ``Retry-After`` instead of queueing behind it.
+
+Token buckets and in-flight counters live in a named shared memory block
+(per-process memory if shared memory is unavailable), so every gunicorn
+worker enforces the same limits: a client gets its configured rate however
+its requests are spread over workers. Each worker counts its in-flight units
+in its own slot; slots of workers that died mid-request (e.g. killed at the
+gunicorn timeout) are reclaimed, so their units are not leaked.
+
+With the shipped gthread workers (``--threads``) a request is admitted as
+soon as a thread picks it up, so work waiting behind busy threads is seen
+and rejected with 503 rather than queueing in gunicorn's accept backlog.
+
+Configuration (environment variables, 0 disables a check):
+
+- ``RATE_LIMIT_RATE``: units per second per client (default 100)
+- ``RATE_LIMIT_BURST``: bucket size (default 1000)
+- ``RATE_LIMIT_TRUST_PROXY``: use the last ``X-Forwarded-For`` address (the
+  one appended by the reverse proxy in front of the app) as the client IP
+  (default 0). Earlier entries are set by the client and are ignored.
+- ``API_KEYS``: comma-separated API keys that get their own bucket; any
+  other ``X-API-Key`` value is ignored and the caller is limited by IP
+- ``MAX_BATCH_SIZE``: samples per ``/predict/batch`` request (default 1000)
+- ``MAX_INFLIGHT_UNITS``: concurrent work units on the host (default 2000)
+- ``ADMISSION_CLIENT_SLOTS``: token buckets kept in shared memory (default 16384)
+- ``ADMISSION_SHM_NAME``: shared memory block name (default ``knn_admission``)
+"""
+
+import os
+import math
+import time
+import hashlib
+from functools import wraps
+
+import numpy as np
+from flask import request, jsonify
+
+from prediction_cache import SharedLock, open_shared_block, pid_alive
+
+RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', '100'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '1000'))
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', '0') == '1'
+API_KEYS = frozenset(key.strip() for key in os.environ.get('API_KEYS', '').split(',') if key.strip())
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+MAX_INFLIGHT_UNITS = int(os.environ.get('MAX_INFLIGHT_UNITS', '2000'))
+ADMISSION_CLIENT_SLOTS = int(os.environ.get('ADMISSION_CLIENT_SLOTS', '16384'))
+ADMISSION_SHM_NAME = os.environ.get('ADMISSION_SHM_NAME', 'knn_admission')
+
+MAX_WORKERS = 64
+PROBE_WINDOW = 8
+OCCUPIED_BIT = 1 << 63
+
+WORKER_DTYPE = np.dtype([('pid', '<i8'), ('units', '<f8')])
+BUCKET_DTYPE = np.dtype([('key', '<u8'), ('tokens', '<f8'), ('last', '<f8')])
+
+_lock = SharedLock(ADMISSION_SHM_NAME)
+_block = None
+_workers = None  # per-worker in-flight units, one slot per live process
+_buckets = None  # open-addressing table of client token buckets
+_worker_slot = None
+_worker_pid = None
+
+
+def _attach():
+    """Map the shared state on first use in this process."""
+    global _block, _workers, _buckets
+    if _workers is not None:
+        return
+    size = MAX_WORKERS * WORKER_DTYPE.itemsize + ADMISSION_CLIENT_SLOTS * BUCKET_DTYPE.itemsize
+    try:
+        _block = open_shared_block(ADMISSION_SHM_NAME, size)
+        buf = _block.buf
+    except Exception as e:
+        print(f"⚠️  Shared admission state unavailable, limits are per worker: {e}")
+        buf = bytearray(size)
+    _workers = np.ndarray((MAX_WORKERS,), dtype=WORKER_DTYPE, buffer=buf)
+    _buckets = np.ndarray((ADMISSION_CLIENT_SLOTS,), dtype=BUCKET_DTYPE, buffer=buf,
+                          offset=MAX_WORKERS * WORKER_DTYPE.itemsize)
+
+
+def _reclaim_dead_workers():
+    """Free slots of processes that exited without releasing their units."""
+    for idx in np.flatnonzero(_workers['pid']):
+        if not pid_alive(_workers['pid'][idx]):
+            _workers[idx] = (0, 0.0)
+
+
+def _own_slot():
+    """Index of this process's in-flight slot (called with the lock held)."""
+    global _worker_slot, _worker_pid
+    pid = os.getpid()
+    if _worker_pid == pid and _workers['pid'][_worker_slot] == pid:
+        return _worker_slot
+    free = np.flatnonzero(_workers['pid'] == 0)
+    if not len(free):
+        _reclaim_dead_workers()
+        free = np.flatnonzero(_workers['pid'] == 0)
+    if not len(free):
+        return None
+    _worker_slot, _worker_pid = int(free[0]), pid
+    _workers[_worker_slot] = (pid, 0.0)
+    return _worker_slot
+
+
+def _client_key(client):
+    digest = hashlib.blake2b(client.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') | OCCUPIED_BIT
+
+
+def client_id():
+    """Identify the caller by a configured API key, falling back to the client IP.
+
+    Unknown keys are ignored so rotating made-up keys cannot buy fresh
+    buckets. Behind a proxy only the hop the proxy itself appended to
+    ``X-Forwarded-For`` is trusted; anything before it comes from the client.
+    """
+    api_key = request.headers.get('X-API-Key')
+    if api_key and api_key in API_KEYS:
+        return f'key:{api_key}'
+    if RATE_LIMIT_TRUST_PROXY and request.headers.get('X-Forwarded-For'):
+        return 'ip:' + request.headers['X-Forwarded-For'].split(',')[-1].strip()
+    return f'ip:{request.remote_addr}'
+
+
+def _bucket_slot(key, now):
+    """Slot holding ``key``'s bucket, claiming an empty or the stalest one."""
+    start = (key * 0x9E3779B97F4A7C15 & ((1 << 64) - 1)) % ADMISSION_CLIENT_SLOTS
+    window = [(start + i) % ADMISSION_CLIENT_SLOTS for i in range(PROBE_WINDOW)]
+    for idx in window:
+        if _buckets['key'][idx] == key:
+            return idx
+    for idx in window:
+        if _buckets['key'][idx] == 0:
+            break
+    else:
+        # Window full: reuse the bucket idle longest (likely refilled anyway)
+        idx = min(window, key=lambda i: _buckets['last'][i])
+    _buckets[idx] = (key, RATE_LIMIT_BURST, now)
+    return idx
+
+
+def _take_tokens(client, cost):
+    """Try to take ``cost`` tokens; return 0 on success or seconds to wait."""
+    if RATE_LIMIT_RATE <= 0:
+        return 0
+    _attach()
+    key = _client_key(client)
+    # CLOCK_MONOTONIC is system-wide, so timestamps compare across workers
+    now = time.monotonic()
+    with _lock:
+        idx = _bucket_slot(key, now)
+        tokens = min(RATE_LIMIT_BURST, _buckets['tokens'][idx] + (now - _buckets['last'][idx]) * RATE_LIMIT_RATE)
+        _buckets['last'][idx] = now
+        if tokens >= cost:
+            _buckets['tokens'][idx] = tokens - cost
+            return 0
+        _buckets['tokens'][idx] = tokens
+        return (cost - tokens) / RATE_LIMIT_RATE
+
+
+def _acquire_inflight(cost):
+    _attach()
+    with _lock:
+        slot = _own_slot()
+        if slot is None:
+            return True
+        if MAX_INFLIGHT_UNITS > 0:
+            total = _workers['units'].sum()
+            if total > 0 and total + cost > MAX_INFLIGHT_UNITS:
+                _reclaim_dead_workers()
+                total = _workers['units'].sum()
+            # An idle server always admits one request, however large
+            if total > 0 and total + cost > MAX_INFLIGHT_UNITS:
+                return False
+        _workers['units'][slot] += cost
+        return True
+
+
+def _release_inflight(cost):
+    with _lock:
+        slot = _own_slot()
+        if slot is not None:
+            _workers['units'][slot] = max(_workers['units'][slot] - cost, 0.0)
+
+
+def reject(status_code, message, retry_after, **extra):
+    """Build an error response, with a Retry-After header when given."""
+    response = jsonify({
+        'error': message,
+        'status': 'error',
+        'retry_after': retry_after,
+        **extra
+    })
+    response.status_code = status_code
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def single_cost():
+    return 1
+
+
+def batch_cost():
+    """Cost of a batch request: one unit per sample."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('samples'), list):
+        return max(len(data['samples']), 1)
+    return 1
+
+
+def admit(cost_fn=single_cost, max_cost=None):
+    """Route decorator applying size, rate and load checks before the view runs."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cost = cost_fn()
+
+            if max_cost and cost > max_cost:
+                return reject(413, f'Batch size {cost} exceeds the maximum of {max_cost} samples',
+                              None, max_batch_size=max_cost)
+
+            # A bucket can never hold more than the burst size
+            wait = _take_tokens(client_id(), min(cost, RATE_LIMIT_BURST))
+            if wait:
+                return reject(429, 'Rate limit exceeded', max(1, math.ceil(wait)))
+
+            if not _acquire_inflight(cost):
+                return reject(503, 'Server busy, try again shortly', 1)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                _release_inflight(cost)
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Current admission state of the host for the health endpoint."""
+    _attach()
+    with _lock:
+        return {
+            'shared': _block is not None,
+            'inflight_units': int(_workers['units'].sum()),
+            'max_inflight_units': MAX_INFLIGHT_UNITS,
+            'tracked_clients': int(np.count_nonzero(_buckets['key'])),
+            'rate_limit_per_second': RATE_LIMIT_RATE,
+            'rate_limit_burst': RATE_LIMIT_BURST,
+            'max_batch_size': MAX_BATCH_SIZE
+        }
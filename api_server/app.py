@@ -7,27 +7,106 @@ Flask API server to serve KNN model predictions for web applications.
 Supports CORS for React frontend integration.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import os
 import numpy as np
 import joblib
 import json
+import re
 from datetime import datetime
 import traceback
+import artifacts
+import prediction_cache
+import jobs
+import admission
+import rpc_server
+import profiling
+import shadow
+import drift
+import content_encoding
+import auth
+import model_report
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+profiling.init_app(app)  # No-op unless PROFILING_ENABLED=1
+content_encoding.init_app(app)  # gzip/zstd request and response bodies
 
 # Global variables for model
 model = None
 metadata = None
 scaler = None
+model_version = None
 model_loaded = False
+models_dir = None
+
+# Pre-serialized /model/info body, rebuilt on model load
+model_info_body = None
+model_info_etag = None
+
+# Pre-serialized prediction responses keyed by (raw_prediction, route), see
+# compile_prediction_template(); rebuilt on model load
+prediction_templates = {}
+
+# Raw feature values of the KNN training points (for /predict/explain)
+neighbor_features = None
+
+# Set MODEL_ARTIFACTS=0 to ignore artifact directories and load the joblib model
+USE_ARTIFACTS = os.environ.get('MODEL_ARTIFACTS', '1') != '0'
+
+# Model name prefix in Models/ to serve: SERVING_MODEL, else the default
+# chosen with model_report.py --select, else KNN
+if os.environ.get('SERVING_MODEL'):
+    SERVING_MODEL, SERVING_MODEL_SOURCE = os.environ['SERVING_MODEL'], 'SERVING_MODEL'
+elif model_report.read_server_config().get('default_model'):
+    SERVING_MODEL, SERVING_MODEL_SOURCE = model_report.read_server_config()['default_model'], model_report.SERVER_CONFIG
+else:
+    SERVING_MODEL, SERVING_MODEL_SOURCE = 'KNN', 'default'
+
+ALGORITHM_NAMES = {
+    'KNeighborsClassifier': 'K-Nearest Neighbors',
+    'RandomForestClassifier': 'Random Forest',
+    'DecisionTreeClassifier': 'Decision Tree',
+    'LogisticRegression': 'Logistic Regression',
+    'GaussianNB': 'Gaussian Naive Bayes',
+    'SVC': 'Support Vector Machine'
+}
+
+def load_model_artifact(models_dir):
+    """Load the newest SERVING_MODEL artifact in models_dir into the globals.
+    
+    Returns False (leaving the globals untouched) when there is no artifact
+    or it fails validation.
+    """
+    global model, metadata, scaler, model_version
+    
+    artifact_dir = artifacts.find_artifact(models_dir, prefix=f'{SERVING_MODEL}_')
+    if not artifact_dir:
+        return False
+    
+    try:
+        loaded_model, loaded_scaler, manifest = artifacts.load_knn_artifact(artifact_dir)
+    except artifacts.ArtifactError as e:
+        print(f"❌ Rejected model artifact {artifact_dir}: {e}")
+        return False
+    
+    model, scaler = loaded_model, loaded_scaler
+    metadata = {
+        'model_name': manifest['model_name'],
+        'timestamp': manifest['timestamp'],
+        'results': manifest['metrics'],
+        'training_baseline': manifest.get('training_baseline')
+    }
+    model_version = manifest['version']
+    print(f"✅ Loaded verified model artifact: {artifact_dir}")
+    return True
 
 def load_knn_model():
     """Load KNN model and metadata on startup."""
-    global model, metadata, model_loaded, scaler
+    global model, metadata, model_loaded, scaler, model_version, models_dir
+    global SERVING_MODEL, SERVING_MODEL_SOURCE
+    global model_info_body, model_info_etag, prediction_templates, neighbor_features
     
     print("🔍 DEBUG: Starting model loading process...")
     print(f"🔍 DEBUG: Current working directory: {os.getcwd()}")
@@ -68,70 +147,168 @@ def load_knn_model():
         return False
     
     try:
-        print(f"🔍 DEBUG: Looking for KNN files in: {models_dir}")
-        files_in_models = os.listdir(models_dir)
-        print(f"🔍 DEBUG: Files in Models directory: {files_in_models}")
-        
-        # Find KNN files
-        knn_model_file = None
-        knn_metadata_file = None
-        
-        for filename in files_in_models:
-            print(f"🔍 DEBUG: Checking file: {filename}")
-            if filename.startswith('KNN') and filename.endswith('.joblib'):
-                knn_model_file = filename
-                print(f"✅ DEBUG: Found KNN model file: {filename}")
-            elif filename.startswith('KNN') and filename.endswith('_metadata.json'):
-                knn_metadata_file = filename
-                print(f"✅ DEBUG: Found KNN metadata file: {filename}")
-        
-        print(f"🔍 DEBUG: Model file: {knn_model_file}")
-        print(f"🔍 DEBUG: Metadata file: {knn_metadata_file}")
-        
-        if not knn_model_file or not knn_metadata_file:
-            print("❌ KNN model files not found")
-            return False
-        
-        # Load model and metadata
-        model_path = os.path.join(models_dir, knn_model_file)
-        metadata_path = os.path.join(models_dir, knn_metadata_file)
-        
-        model = joblib.load(model_path)
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
-        
-        # Create a scaler fitted to the original data range
-        # Wisconsin dataset features are already in range 1-10, so we need to recreate the scaler
-        # that was used during training
-        from sklearn.preprocessing import StandardScaler
-        
-        # Approximate the original data statistics for scaling
-        # These are representative values from the Wisconsin dataset
-        scaler = StandardScaler()
-        # Fit scaler with representative data (features range 1-10)
-        sample_data = np.array([
-            [1, 1, 1, 1, 1, 1, 1, 1, 1],  # Min values
-            [10, 10, 10, 10, 10, 10, 10, 10, 10],  # Max values
-            [5, 3, 3, 3, 3, 3, 3, 3, 1],  # Typical benign
-            [8, 7, 8, 7, 6, 9, 7, 8, 3],  # Typical malignant
-            [3, 1, 1, 1, 2, 1, 3, 1, 1],  # Another benign
-            [4, 2, 1, 1, 2, 1, 2, 1, 1],  # Another benign
-            [6, 8, 8, 1, 3, 4, 3, 7, 1],  # Borderline
-        ])
-        scaler.fit(sample_data)
+        if not (USE_ARTIFACTS and load_model_artifact(models_dir)):
+            print(f"🔍 DEBUG: Looking for KNN files in: {models_dir}")
+            files_in_models = os.listdir(models_dir)
+            print(f"🔍 DEBUG: Files in Models directory: {files_in_models}")
+            
+            # Find model files
+            knn_model_file = None
+            knn_metadata_file = None
+            
+            for filename in files_in_models:
+                print(f"🔍 DEBUG: Checking file: {filename}")
+                if filename.startswith(f'{SERVING_MODEL}_') and filename.endswith('.joblib'):
+                    knn_model_file = filename
+                    print(f"✅ DEBUG: Found {SERVING_MODEL} model file: {filename}")
+                elif filename.startswith(f'{SERVING_MODEL}_') and filename.endswith('_metadata.json'):
+                    knn_metadata_file = filename
+                    print(f"✅ DEBUG: Found {SERVING_MODEL} metadata file: {filename}")
+            
+            print(f"🔍 DEBUG: Model file: {knn_model_file}")
+            print(f"🔍 DEBUG: Metadata file: {knn_metadata_file}")
+            
+            if not knn_model_file or not knn_metadata_file:
+                if SERVING_MODEL == 'KNN':
+                    print("❌ KNN model files not found")
+                    return False
+                print(f"❌ {SERVING_MODEL} model files not found, falling back to KNN")
+                SERVING_MODEL, SERVING_MODEL_SOURCE = 'KNN', f'fallback from {SERVING_MODEL}'
+                return load_knn_model()
+            
+            # Load model and metadata
+            model_path = os.path.join(models_dir, knn_model_file)
+            metadata_path = os.path.join(models_dir, knn_metadata_file)
+            
+            model = joblib.load(model_path)
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            
+            scaler = artifacts.build_legacy_scaler()
+            model_version = f"{metadata['model_name']}_{metadata['timestamp']}"
+        
+        print(f"📌 Serving model {SERVING_MODEL} (selected by {SERVING_MODEL_SOURCE})")
+        # Every prediction path needs class probabilities
+        if not model_report.is_servable(model):
+            if SERVING_MODEL == 'KNN':
+                print("❌ KNN model has no predict_proba and cannot be served")
+                return False
+            print(f"❌ {SERVING_MODEL} has no predict_proba and cannot be served, falling back to KNN")
+            SERVING_MODEL, SERVING_MODEL_SOURCE = 'KNN', f'fallback from {SERVING_MODEL}'
+            return load_knn_model()
+        
+        prediction_cache.configure(model_version)
+        jobs.init_jobs(predict_matrix)
+        shadow.init_shadow(models_dir, scaler, model_version)
+        drift.init_drift(training_baseline(), model_version)
+        
+        # Raw 1-10 values of the training points, returned with explanations
+        try:
+            neighbor_features = artifacts.recover_raw_features(np.asarray(model._fit_X))
+        except Exception as e:
+            neighbor_features = None
+            print(f"⚠️  Neighbour features unavailable for explanations: {e}")
+        
+        model_info_body = serialize(build_model_info())
+        model_info_etag = f"info-{model_version}"
+        prediction_templates = {
+            (label, 'post'): compile_prediction_template(label, timestamp=TEMPLATE_SLOT)
+            for label in (2, 4)
+        }
+        prediction_templates.update({
+            (label, 'get'): compile_prediction_template(label, model_version=model_version)
+            for label in (2, 4)
+        })
         
         model_loaded = True
-        print(f"✅ KNN Model loaded successfully")
+        print(f"✅ {metadata['model_name']} Model loaded successfully")
         print(f"   📊 Test Accuracy: {metadata['results']['test_accuracy']:.4f}")
-        print(f"   🎯 Algorithm: K-Nearest Neighbors (k=3)")
+        print(f"   🎯 Algorithm: {algorithm_name()}")
         print(f"   🔧 Scaler initialized for feature scaling")
         return True
         
     except Exception as e:
-        print(f"❌ Error loading KNN model: {e}")
+        print(f"❌ Error loading {SERVING_MODEL} model: {e}")
         traceback.print_exc()
         return False
 
+def training_baseline():
+    """Training input distribution for drift reports, or None if unavailable."""
+    if metadata.get('training_baseline'):
+        return metadata['training_baseline']
+    try:
+        return artifacts.training_baseline(model._fit_X, model.classes_[model._y])
+    except Exception as e:
+        print(f"⚠️  No training baseline for drift statistics: {e}")
+        return None
+
+def record_served(samples, predictions):
+    """Feed served samples to the off-path monitors (drift stats, shadow models)."""
+    drift.update(samples, predictions)
+    shadow.submit(samples, predictions)
+
+def predict_matrix(samples):
+    """Scale and predict an (n, 9) array in one vectorized call.
+    
+    Returns (predictions, prob_benign, prob_malignant) arrays.
+    """
+    X_scaled = scaler.transform(np.asarray(samples, dtype=float))
+    probs = model.predict_proba(X_scaled)
+    predictions = model.classes_[probs.argmax(axis=1)]
+    record_served(samples, predictions)
+    return predictions, probs[:, 0], probs[:, 1]
+
+def explain_matrix(samples):
+    """Predict an (n, 9) array and return the neighbours behind each prediction.
+    
+    One kneighbors() search yields both the neighbours and the prediction:
+    with uniform weights the KNN class probabilities are the class shares
+    among the k neighbours, exactly what predict_proba() computes.
+    
+    Returns (predictions, prob_benign, prob_malignant, distances, indices).
+    """
+    X_scaled = scaler.transform(np.asarray(samples, dtype=float))
+    distances, indices = model.kneighbors(X_scaled)
+    if model.weights == 'uniform':
+        neighbor_codes = model._y[indices]
+        votes = np.stack([np.sum(neighbor_codes == c, axis=1) for c in range(len(model.classes_))], axis=1)
+        probs = votes / indices.shape[1]
+    else:
+        probs = model.predict_proba(X_scaled)
+    predictions = model.classes_[probs.argmax(axis=1)]
+    record_served(samples, predictions)
+    return predictions, probs[:, 0], probs[:, 1], distances, indices
+
+def build_explanations(predictions, prob_benign, prob_malignant, distances, indices):
+    """Turn explain_matrix() output into per-sample result dicts."""
+    neighbor_labels = model.classes_[model._y[indices]].tolist()
+    distances = np.round(distances, 4).tolist()
+    indices = indices.tolist()
+    results = []
+    for i, prediction in enumerate(predictions.tolist()):
+        neighbors = []
+        for index, distance, label in zip(indices[i], distances[i], neighbor_labels[i]):
+            neighbor = {
+                'index': index,
+                'distance': distance,
+                'diagnosis': 'Benign' if label == 2 else 'Malignant',
+                'raw_label': label
+            }
+            if neighbor_features is not None:
+                neighbor['features'] = neighbor_features[index].tolist()
+            neighbors.append(neighbor)
+        results.append({
+            'diagnosis': 'Benign' if prediction == 2 else 'Malignant',
+            'confidence': round(float(max(prob_benign[i], prob_malignant[i])), 3),
+            'raw_prediction': prediction,
+            'probabilities': {
+                'benign': round(float(prob_benign[i]), 3),
+                'malignant': round(float(prob_malignant[i]), 3)
+            },
+            'neighbors': neighbors
+        })
+    return results
+
 @app.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -139,26 +316,29 @@ def health_check():
         'status': 'healthy',
         'service': 'KNN Breast Cancer Prediction API',
         'model_loaded': model_loaded,
+        'model_version': model_version,
+        'prediction_cache': prediction_cache.stats(),
+        'admission': admission.stats(),
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/model/info', methods=['GET'])
-def model_info():
-    """Get model information and metadata."""
-    if not model_loaded:
-        return jsonify({
-            'error': 'Model not loaded',
-            'status': 'error'
-        }), 500
-    
-    return jsonify({
+def algorithm_name():
+    name = ALGORITHM_NAMES.get(type(model).__name__, type(model).__name__)
+    if hasattr(model, 'n_neighbors'):
+        name += f' (k={model.n_neighbors})'
+    return name
+
+def build_model_info():
+    """Build the /model/info response for the loaded model."""
+    return {
         'status': 'success',
         'model_info': {
-            'algorithm': 'K-Nearest Neighbors',
-            'k_value': 3,
+            'algorithm': ALGORITHM_NAMES.get(type(model).__name__, type(model).__name__),
+            'k_value': getattr(model, 'n_neighbors', None),
             'accuracy': metadata['results']['test_accuracy'],
             'f1_score': metadata['results']['f1_score'],
             'training_date': metadata['timestamp'],
+            'model_version': model_version,
             'features': [
                 'clump_thickness',
                 'uniform_cell_size', 
@@ -176,9 +356,193 @@ def model_info():
                 '4': 'Malignant'
             }
         }
-    })
+    }
+
+def serialize(body):
+    """Serialize a response body exactly like jsonify() does in production."""
+    return app.json.dumps(body, separators=(',', ':')) + '\n'
+
+def set_cache_headers(response, etag):
+    """Make a response cacheable but revalidated on every reuse.
+    
+    The URL does not carry the model version, so a cached copy must be
+    checked against the current ETag (a cheap 304) rather than served
+    from a max-age window that could outlive a model change.
+    """
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+def cacheable_response(body, etag):
+    """Wrap a pre-serialized JSON body with ETag/Cache-Control headers.
+    
+    Answers 304 Not Modified when the client's If-None-Match matches.
+    """
+    response = set_cache_headers(Response(body, mimetype='application/json'), etag)
+    return response.make_conditional(request)
+
+@app.route('/model/info', methods=['GET'])
+def model_info():
+    """Get model information and metadata."""
+    if not model_loaded:
+        return jsonify({
+            'error': 'Model not loaded',
+            'status': 'error'
+        }), 500
+    
+    # Body is serialized once per model load
+    return cacheable_response(model_info_body, model_info_etag)
+
+def validate_features(features):
+    """Return an error response for an invalid feature list, or None."""
+    if not isinstance(features, list) or len(features) != 9:
+        return jsonify({
+            'error': 'Features must be a list of 9 numbers',
+            'status': 'error',
+            'provided_length': len(features) if isinstance(features, list) else 'not_a_list'
+        }), 400
+    
+    # Check feature ranges (1-10)
+    for i, feature in enumerate(features):
+        if not isinstance(feature, (int, float)) or not (1 <= feature <= 10):
+            return jsonify({
+                'error': f'Feature {i+1} must be a number between 1 and 10',
+                'status': 'error',
+                'provided_value': feature
+            }), 400
+    
+    return None
+
+def predict_single(features):
+    """Predict one sample, consulting the shared cache first.
+    
+    Returns (prediction, confidence, prob_benign, prob_malignant).
+    """
+    # Shared cache hit skips scaling and the neighbour search entirely
+    cached = prediction_cache.get(features)
+    if cached is not None:
+        prediction, prob_benign, prob_malignant = cached
+        return prediction, max(prob_benign, prob_malignant), prob_benign, prob_malignant
+    
+    # Make prediction
+    X = np.array(features).reshape(1, -1)
+    
+    # Apply feature scaling (CRITICAL: Model was trained on scaled data)
+    X_scaled = scaler.transform(X)
+    print(f"🔍 DEBUG: Raw features: {features}")
+    print(f"🔍 DEBUG: Scaled features: {X_scaled[0]}")
+    
+    prediction = model.predict(X_scaled)[0]
+    print(f"🔍 DEBUG: Model prediction: {prediction}")
+    
+    # Get probabilities
+    try:
+        probs = model.predict_proba(X_scaled)[0]
+        confidence = max(probs)
+        prob_benign = probs[0] if len(probs) > 1 else (1.0 if prediction == 2 else 0.0)
+        prob_malignant = probs[1] if len(probs) > 1 else (1.0 if prediction == 4 else 0.0)
+    except:
+        confidence = 1.0
+        prob_benign = 1.0 if prediction == 2 else 0.0
+        prob_malignant = 1.0 if prediction == 4 else 0.0
+    
+    prediction_cache.put(features, prediction, prob_benign, prob_malignant)
+    return prediction, confidence, prob_benign, prob_malignant
+
+def build_prediction(features, prediction, confidence, prob_benign, prob_malignant):
+    """Build the single-prediction response body (without timestamp).
+    
+    Numeric values are inserted as given; request handlers go through
+    render_prediction() instead, which rounds them and splices them into
+    a pre-serialized template.
+    """
+    # Format diagnosis
+    diagnosis = "Benign" if prediction == 2 else "Malignant"
+    risk_level = "Low" if prediction == 2 else "High"
+    
+    # Medical interpretation
+    if prediction == 2:
+        interpretation = "The tissue sample shows characteristics consistent with benign (non-cancerous) cells."
+        recommendation = "Continue regular screening as recommended by healthcare provider."
+    else:
+        interpretation = "The tissue sample shows characteristics that may indicate malignant (cancerous) cells."
+        recommendation = "Immediate consultation with oncologist recommended for further evaluation."
+    
+    return {
+        'status': 'success',
+        'prediction': {
+            'diagnosis': diagnosis,
+            'confidence': confidence,
+            'risk_level': risk_level,
+            'raw_prediction': int(prediction),
+            'probabilities': {
+                'benign': prob_benign,
+                'malignant': prob_malignant
+            }
+        },
+        'medical_interpretation': {
+            'interpretation': interpretation,
+            'recommendation': recommendation,
+            'disclaimer': "This prediction is for research purposes only and should not replace professional medical diagnosis."
+        },
+        'input_features': {
+            'clump_thickness': features[0],
+            'uniform_cell_size': features[1],
+            'uniform_cell_shape': features[2],
+            'marginal_adhesion': features[3],
+            'single_epithelial_cell_size': features[4],
+            'bare_nuclei': features[5],
+            'bland_chromatin': features[6],
+            'normal_nucleoli': features[7],
+            'mitoses': features[8]
+        }
+    }
+
+# Placeholder marking a value to be filled in at request time
+TEMPLATE_SLOT = object()
+
+def compile_prediction_template(prediction, **extra):
+    """Pre-serialize the response for one diagnosis as a str.format template.
+    
+    Everything constant for the diagnosis (texts, keys, risk level) is
+    encoded once; only the numeric fields, echoed inputs and any extra
+    field passed as TEMPLATE_SLOT are left as {slots}.
+    """
+    slots = {}
+    
+    def slot(name):
+        marker = f'@@{name}@@'
+        slots[marker] = name
+        return marker
+    
+    body = build_prediction([slot(f'f{i}') for i in range(9)], prediction,
+                            slot('confidence'), slot('prob_benign'), slot('prob_malignant'))
+    for key, value in extra.items():
+        body[key] = slot(key) if value is TEMPLATE_SLOT else value
+    
+    text = serialize(body).replace('{', '{{').replace('}', '}}')
+    return re.sub(r'"(@@\w+@@)"', lambda m: '{' + slots[m.group(1)] + '}', text)
+
+def json_number(value):
+    """Encode an int/float (or bool) input feature as JSON text."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return repr(value)
+
+def render_prediction(route, features, prediction, confidence, prob_benign, prob_malignant, **extra):
+    """Fill the pre-serialized template for ``prediction`` and return JSON text."""
+    f0, f1, f2, f3, f4, f5, f6, f7, f8 = (json_number(value) for value in features)
+    return prediction_templates[(int(prediction), route)].format(
+        confidence=repr(round(float(confidence), 3)),
+        prob_benign=repr(round(float(prob_benign), 3)),
+        prob_malignant=repr(round(float(prob_malignant), 3)),
+        f0=f0, f1=f1, f2=f2, f3=f3, f4=f4, f5=f5, f6=f6, f7=f7, f8=f8,
+        **extra
+    )
 
 @app.route('/predict', methods=['POST'])
+@admission.admit()
 def predict():
     """Make prediction on breast cancer data."""
     if not model_loaded:
@@ -209,96 +573,79 @@ def predict():
         
         features = data['features']
         
-        # Validate features
-        if not isinstance(features, list) or len(features) != 9:
-            return jsonify({
-                'error': 'Features must be a list of 9 numbers',
-                'status': 'error',
-                'provided_length': len(features) if isinstance(features, list) else 'not_a_list'
-            }), 400
-        
-        # Check feature ranges (1-10)
-        for i, feature in enumerate(features):
-            if not isinstance(feature, (int, float)) or not (1 <= feature <= 10):
-                return jsonify({
-                    'error': f'Feature {i+1} must be a number between 1 and 10',
-                    'status': 'error',
-                    'provided_value': feature
-                }), 400
+        error = validate_features(features)
+        if error:
+            return error
         
-        # Make prediction
-        X = np.array(features).reshape(1, -1)
-        
-        # Apply feature scaling (CRITICAL: Model was trained on scaled data)
-        X_scaled = scaler.transform(X)
-        print(f"🔍 DEBUG: Raw features: {features}")
-        print(f"🔍 DEBUG: Scaled features: {X_scaled[0]}")
-        
-        prediction = model.predict(X_scaled)[0]
-        print(f"🔍 DEBUG: Model prediction: {prediction}")
-        
-        # Get probabilities
-        try:
-            probs = model.predict_proba(X_scaled)[0]
-            confidence = max(probs)
-            prob_benign = probs[0] if len(probs) > 1 else (1.0 if prediction == 2 else 0.0)
-            prob_malignant = probs[1] if len(probs) > 1 else (1.0 if prediction == 4 else 0.0)
-        except:
-            confidence = 1.0
-            prob_benign = 1.0 if prediction == 2 else 0.0
-            prob_malignant = 1.0 if prediction == 4 else 0.0
-        
-        # Format diagnosis
-        diagnosis = "Benign" if prediction == 2 else "Malignant"
-        risk_level = "Low" if prediction == 2 else "High"
-        
-        # Medical interpretation
-        if prediction == 2:
-            interpretation = "The tissue sample shows characteristics consistent with benign (non-cancerous) cells."
-            recommendation = "Continue regular screening as recommended by healthcare provider."
-        else:
-            interpretation = "The tissue sample shows characteristics that may indicate malignant (cancerous) cells."
-            recommendation = "Immediate consultation with oncologist recommended for further evaluation."
+        scored = predict_single(features)
+        record_served([features], [scored[0]])
+        body = render_prediction('post', features, *scored,
+                                 timestamp=f'"{datetime.now().isoformat()}"')
+        return Response(body, mimetype='application/json')
         
+    except Exception as e:
         return jsonify({
-            'status': 'success',
-            'prediction': {
-                'diagnosis': diagnosis,
-                'confidence': round(confidence, 3),
-                'risk_level': risk_level,
-                'raw_prediction': int(prediction),
-                'probabilities': {
-                    'benign': round(prob_benign, 3),
-                    'malignant': round(prob_malignant, 3)
-                }
-            },
-            'medical_interpretation': {
-                'interpretation': interpretation,
-                'recommendation': recommendation,
-                'disclaimer': "This prediction is for research purposes only and should not replace professional medical diagnosis."
-            },
-            'input_features': {
-                'clump_thickness': features[0],
-                'uniform_cell_size': features[1],
-                'uniform_cell_shape': features[2],
-                'marginal_adhesion': features[3],
-                'single_epithelial_cell_size': features[4],
-                'bare_nuclei': features[5],
-                'bland_chromatin': features[6],
-                'normal_nucleoli': features[7],
-                'mitoses': features[8]
-            },
+            'error': f'Prediction error: {str(e)}',
+            'status': 'error',
             'timestamp': datetime.now().isoformat()
-        })
+        }), 500
+
+@app.route('/predict', methods=['GET'])
+@admission.admit()
+def predict_get():
+    """Cacheable prediction: GET /predict?f=2,1,1,1,2,1,2,1,1
+    
+    The response depends only on the features and the model version, so it
+    carries no timestamp and is served with an ETag and Cache-Control so
+    browsers and CDNs can answer repeats without reaching the server.
+    """
+    if not model_loaded:
+        return jsonify({
+            'error': 'Model not loaded',
+            'status': 'error'
+        }), 500
+    
+    raw = request.args.get('f')
+    if not raw:
+        return jsonify({
+            'error': 'Missing "f" query parameter',
+            'status': 'error',
+            'expected_format': '/predict?f=2,1,1,1,2,1,2,1,1'
+        }), 400
+    
+    try:
+        features = [float(value) for value in raw.split(',')]
+    except ValueError:
+        return jsonify({
+            'error': 'Features must be a list of 9 numbers',
+            'status': 'error',
+            'provided_value': raw
+        }), 400
+    features = [int(value) if value.is_integer() else value for value in features]
+    
+    error = validate_features(features)
+    if error:
+        return error
+    
+    # Conditional requests are answered before touching the model
+    etag = f"{model_version}-{'-'.join(str(value) for value in features)}"
+    if etag in request.if_none_match:
+        return set_cache_headers(Response(status=304), etag)
+    
+    try:
+        scored = predict_single(features)
+        record_served([features], [scored[0]])
+        body = render_prediction('get', features, *scored)
+        return cacheable_response(body, etag)
         
     except Exception as e:
         return jsonify({
             'error': f'Prediction error: {str(e)}',
-            'status': 'error',
-            'timestamp': datetime.now().isoformat()
+            'status': 'error'
         }), 500
 
 @app.route('/predict/batch', methods=['POST'])
+@admission.admit(admission.batch_cost, max_cost=admission.MAX_BATCH_SIZE)
 def predict_batch():
     """Make predictions on multiple samples."""
     if not model_loaded:
@@ -330,6 +677,36 @@ def predict_batch():
                 'status': 'error'
             }), 400
         
+        layout = request.args.get('format') or data.get('format', 'rows')
+        if layout not in ('rows', 'columnar'):
+            return jsonify({
+                'error': 'Format must be "rows" or "columnar"',
+                'status': 'error'
+            }), 400
+        
+        if layout == 'columnar':
+            for i, sample in enumerate(samples):
+                if not isinstance(sample, list) or len(sample) != 9:
+                    return jsonify({
+                        'error': f'Sample {i+1} must be a list of 9 numbers',
+                        'status': 'error'
+                    }), 400
+            
+            # One vectorized call; arrays instead of a dict per row
+            predictions, prob_benign, prob_malignant = predict_matrix(samples)
+            return jsonify({
+                'status': 'success',
+                'batch_size': len(samples),
+                'format': 'columnar',
+                'results': {
+                    'raw_prediction': predictions.tolist(),
+                    'confidence': np.round(np.maximum(prob_benign, prob_malignant), 3).tolist(),
+                    'prob_benign': np.round(prob_benign, 3).tolist(),
+                    'prob_malignant': np.round(prob_malignant, 3).tolist()
+                },
+                'timestamp': datetime.now().isoformat()
+            })
+        
         results = []
         
         for i, sample in enumerate(samples):
@@ -339,22 +716,29 @@ def predict_batch():
                     'status': 'error'
                 }), 400
             
-            # Make prediction for this sample
-            X = np.array(sample).reshape(1, -1)
-            
-            # Apply feature scaling (CRITICAL: Model was trained on scaled data)
-            X_scaled = scaler.transform(X)
-            prediction = model.predict(X_scaled)[0]
-            
-            try:
-                probs = model.predict_proba(X_scaled)[0]
-                confidence = max(probs)
-                prob_benign = probs[0] if len(probs) > 1 else (1.0 if prediction == 2 else 0.0)
-                prob_malignant = probs[1] if len(probs) > 1 else (1.0 if prediction == 4 else 0.0)
-            except:
-                confidence = 1.0
-                prob_benign = 1.0 if prediction == 2 else 0.0
-                prob_malignant = 1.0 if prediction == 4 else 0.0
+            cached = prediction_cache.get(sample)
+            if cached is not None:
+                prediction, prob_benign, prob_malignant = cached
+                confidence = max(prob_benign, prob_malignant)
+            else:
+                # Make prediction for this sample
+                X = np.array(sample).reshape(1, -1)
+                
+                # Apply feature scaling (CRITICAL: Model was trained on scaled data)
+                X_scaled = scaler.transform(X)
+                prediction = model.predict(X_scaled)[0]
+                
+                try:
+                    probs = model.predict_proba(X_scaled)[0]
+                    confidence = max(probs)
+                    prob_benign = probs[0] if len(probs) > 1 else (1.0 if prediction == 2 else 0.0)
+                    prob_malignant = probs[1] if len(probs) > 1 else (1.0 if prediction == 4 else 0.0)
+                except:
+                    confidence = 1.0
+                    prob_benign = 1.0 if prediction == 2 else 0.0
+                    prob_malignant = 1.0 if prediction == 4 else 0.0
+                
+                prediction_cache.put(sample, prediction, prob_benign, prob_malignant)
             
             diagnosis = "Benign" if prediction == 2 else "Malignant"
             
@@ -369,6 +753,8 @@ def predict_batch():
                 }
             })
         
+        record_served(samples, [result['raw_prediction'] for result in results])
+        
         return jsonify({
             'status': 'success',
             'batch_size': len(samples),
@@ -382,6 +768,305 @@ def predict_batch():
             'status': 'error'
         }), 500
 
+@app.route('/predict/explain', methods=['POST'])
+@admission.admit(admission.batch_cost, max_cost=admission.MAX_BATCH_SIZE)
+def predict_explain():
+    """Predict with the k nearest training samples behind each prediction.
+    
+    Accepts {"features": [...]} for one sample or {"samples": [[...], ...]}
+    for a batch; the whole request is one vectorized neighbour search.
+    """
+    if not model_loaded:
+        return jsonify({
+            'error': 'Model not loaded',
+            'status': 'error'
+        }), 500
+    
+    if not hasattr(model, 'kneighbors'):
+        return jsonify({
+            'error': f"Explanations need a nearest-neighbour model, the served model is {metadata['model_name']}",
+            'status': 'error'
+        }), 501
+    
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or ('features' not in data and 'samples' not in data):
+            return jsonify({
+                'error': 'Provide a "features" list or a "samples" list',
+                'status': 'error',
+                'expected_format': {
+                    'features': [2, 1, 1, 1, 2, 1, 2, 1, 1]
+                }
+            }), 400
+        
+        single = 'features' in data
+        samples = [data['features']] if single else data['samples']
+        
+        if not isinstance(samples, list) or len(samples) == 0:
+            return jsonify({
+                'error': 'Samples must be a non-empty list',
+                'status': 'error'
+            }), 400
+        
+        for sample in samples:
+            error = validate_features(sample)
+            if error:
+                return error
+        
+        results = build_explanations(*explain_matrix(samples))
+        
+        if single:
+            result = results[0]
+            return jsonify({
+                'status': 'success',
+                'prediction': {key: value for key, value in result.items() if key != 'neighbors'},
+                'neighbors': result['neighbors'],
+                'k': len(result['neighbors']),
+                'timestamp': datetime.now().isoformat()
+            })
+        
+        return jsonify({
+            'status': 'success',
+            'batch_size': len(samples),
+            'k': len(results[0]['neighbors']),
+            'results': [{'sample_index': i + 1, **result} for i, result in enumerate(results)],
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': f'Explanation error: {str(e)}',
+            'status': 'error'
+        }), 500
+
+@app.route('/jobs', methods=['POST'])
+@admission.admit()
+def create_job():
+    """Queue a large batch for background processing.
+    
+    Accepts either JSON {"samples": [[...], ...]} or a multipart upload
+    with a CSV "file" field (one sample of 9 numbers per line).
+    """
+    if not model_loaded:
+        return jsonify({
+            'error': 'Model not loaded',
+            'status': 'error'
+        }), 500
+    
+    if jobs.is_saturated():
+        return admission.reject(503, 'Too many pending jobs, try again later', 30)
+    
+    try:
+        if 'file' in request.files:
+            job = jobs.submit_file(request.files['file'])
+        else:
+            data = request.get_json(silent=True)
+            
+            if not data or 'samples' not in data:
+                return jsonify({
+                    'error': 'Provide a "samples" field or a CSV "file" upload',
+                    'status': 'error',
+                    'expected_format': {
+                        'samples': [
+                            [1, 1, 1, 1, 2, 1, 3, 1, 1],
+                            [8, 7, 8, 7, 6, 9, 7, 8, 3]
+                        ]
+                    }
+                }), 400
+            
+            samples = data['samples']
+            
+            if not isinstance(samples, list) or len(samples) == 0:
+                return jsonify({
+                    'error': 'Samples must be a non-empty list',
+                    'status': 'error'
+                }), 400
+            
+            job = jobs.submit_samples(samples)
+        
+        return jsonify({
+            'status': 'accepted',
+            'job': job,
+            'status_url': f"/jobs/{job['job_id']}",
+            'results_url': f"/jobs/{job['job_id']}/results"
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'error': f'Job submission error: {str(e)}',
+            'status': 'error'
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get progress of a background job."""
+    job = jobs.get_status(job_id)
+    
+    if job is None:
+        return jsonify({
+            'error': 'Job not found',
+            'status': 'error'
+        }), 404
+    
+    total = job['total_samples']
+    job['progress'] = round(job['processed_samples'] / total, 4) if total else 1.0
+    
+    return jsonify({
+        'status': 'success',
+        'job': job
+    })
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """Get results of a background job.
+    
+    Paginated with ?offset=&limit= (default 0 and 1000), or streamed as
+    JSON Lines with ?stream=1. Results already written are available
+    while the job is still running.
+    """
+    job = jobs.get_status(job_id)
+    
+    if job is None:
+        return jsonify({
+            'error': 'Job not found',
+            'status': 'error'
+        }), 404
+    
+    if request.args.get('stream') in ('1', 'true'):
+        return Response(jobs.iter_result_lines(job_id), mimetype='application/x-ndjson')
+    
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 1000)), 1), 10000)
+    except ValueError:
+        return jsonify({
+            'error': 'offset and limit must be integers',
+            'status': 'error'
+        }), 400
+    
+    results = jobs.get_results(job_id, offset, limit)
+    next_offset = offset + len(results)
+    
+    return jsonify({
+        'status': 'success',
+        'job_state': job['state'],
+        'offset': offset,
+        'limit': limit,
+        'results': results,
+        'next_offset': next_offset if next_offset < job['total_samples'] else None
+    })
+
+@app.route('/stats/drift', methods=['GET', 'DELETE'])
+def drift_stats():
+    """Production input distribution and drift against the training data.
+    
+    DELETE (requires X-Admin-Token) resets the counters.
+    """
+    if request.method == 'DELETE':
+        if not auth.is_admin():
+            return jsonify({
+                'error': 'Admin token required',
+                'status': 'error'
+            }), 403
+        drift.reset()
+    
+    return jsonify({
+        'status': 'success',
+        'model_version': model_version,
+        'drift': drift.report(artifacts.FEATURE_NAMES),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/shadow/stats', methods=['GET'])
+def shadow_stats():
+    """Agreement and timing of shadow candidate models against the serving model."""
+    return jsonify({
+        'status': 'success',
+        'primary_model': model_version,
+        'shadow': shadow.stats()
+    })
+
+@app.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """Sampled request profiles (requires X-Admin-Token).
+    
+    GET returns collapsed stacks merged across workers (flamegraph.pl /
+    speedscope input), POST {"sample_rate": 0.05} changes the fraction of
+    profiled requests, DELETE clears collected stacks.
+    """
+    if not auth.is_admin():
+        return jsonify({
+            'error': 'Admin token required',
+            'status': 'error'
+        }), 403
+    
+    if not profiling.PROFILING_ENABLED:
+        return jsonify({
+            'error': 'Profiling is disabled, start the server with PROFILING_ENABLED=1',
+            'status': 'error'
+        }), 409
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            profiling.set_control(sample_rate=data.get('sample_rate'))
+        except (TypeError, ValueError):
+            return jsonify({
+                'error': 'sample_rate must be a number between 0 and 1',
+                'status': 'error'
+            }), 400
+        return jsonify({'status': 'success', 'profiling': profiling.status()})
+    
+    if request.method == 'DELETE':
+        profiling.set_control(reset=True)
+        return jsonify({'status': 'success', 'profiling': profiling.status()})
+    
+    return Response(profiling.collapsed_stacks(), mimetype='text/plain')
+
+@app.route('/admin/models/report', methods=['GET', 'POST'])
+def admin_model_report():
+    """Last model benchmark written by model_report.py (requires X-Admin-Token).
+    
+    GET returns the report; POST {"select": "<model name>" | "auto"} also
+    writes the chosen default model to the server config, applied on restart.
+    The benchmark runs out of process (python model_report.py), never inside
+    a serving worker.
+    """
+    if not auth.is_admin():
+        return jsonify({
+            'error': 'Admin token required',
+            'status': 'error'
+        }), 403
+    
+    report = model_report.read_report()
+    if report is None:
+        return jsonify({
+            'error': 'No model report yet, run python model_report.py on the server',
+            'status': 'error',
+            'report_path': model_report.MODEL_REPORT
+        }), 404
+    
+    data = request.get_json(silent=True) or {}
+    response = {
+        'status': 'success',
+        'serving_model': metadata['model_name'] if metadata else None,
+        'report': report
+    }
+    
+    if request.method == 'POST' and data.get('select'):
+        try:
+            config = model_report.select_model(report, data['select'])
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'status': 'error'
+            }), 400
+        response['server_config'] = config
+        response['restart_required'] = config['default_model'] != response['serving_model']
+    
+    return jsonify(response)
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
@@ -391,7 +1076,16 @@ def not_found(error):
             'GET /',
             'GET /model/info',
             'POST /predict',
-            'POST /predict/batch'
+            'GET /predict?f=<9 comma-separated features>',
+            'POST /predict/batch',
+            'POST /predict/explain',
+            'POST /jobs',
+            'GET /jobs/<job_id>',
+            'GET /jobs/<job_id>/results',
+            'GET /stats/drift',
+            'GET /shadow/stats',
+            'GET|POST|DELETE /admin/profile',
+            'GET|POST /admin/models/report'
         ]
     }), 404
 
@@ -416,7 +1110,14 @@ if __name__ == '__main__':
     print("   GET  /           - Health check")
     print("   GET  /model/info - Model information")
     print("   POST /predict    - Single prediction")
+    print("   GET  /predict?f=2,1,1,1,2,1,2,1,1 - Cacheable single prediction")
     print("   POST /predict/batch - Batch predictions")
+    print("   POST /predict/explain - Prediction with nearest training samples")
+    print("   POST /jobs       - Background batch job (JSON or CSV upload)")
+    print("   GET  /jobs/<id>  - Job progress")
+    print("   GET  /jobs/<id>/results - Paginated or streamed job results")
+    print("   GET  /stats/drift - Input drift against training data")
+    print("   GET  /admin/models/report - Last model benchmark report (admin)")
     
     print("\n📝 Example request:")
     print('   POST /predict')
@@ -433,3 +1134,7 @@ if __name__ == '__main__':
 # Load model when module is imported (for production)
 print("🔄 Loading model on module import...")
 load_knn_model()
+
+# Optional binary RPC listener sharing this worker's model
+if os.environ.get('RPC_LISTEN') and model_loaded:
+    rpc_server.start_in_background(os.environ['RPC_LISTEN'], predict_matrix)
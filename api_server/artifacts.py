@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+KNN Model Artifacts
+===================
+
+Versioned, integrity-checked on-disk format for the served KNN model.
+
+An artifact is a directory ``Models/<model_name>_<timestamp>/`` holding:
+
+- ``manifest.json``: format version, model name/version, hyperparameters,
+  feature schema, training metrics, training input distribution and a
+  sha256 for every array file
+- ``fit_X.npy``, ``y.npy``: the scaled training points and their labels
+- ``scaler_mean.npy``, ``scaler_scale.npy``: the input StandardScaler
+
+Arrays are opened with ``np.load(mmap_mode='r')`` after their hashes are
+verified, so loading needs no unpickling of sklearn objects and a
+corrupted, truncated or mismatched artifact is rejected before serving.
+
+Usage (convert the legacy joblib model into an artifact):
+
+    python artifacts.py export
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+import numpy as np
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+FEATURE_NAMES = [
+    'clump_thickness',
+    'uniform_cell_size',
+    'uniform_cell_shape',
+    'marginal_adhesion',
+    'single_epithelial_cell_size',
+    'bare_nuclei',
+    'bland_chromatin',
+    'normal_nucleoli',
+    'mitoses'
+]
+
+# Hyperparameters copied from / restored to KNeighborsClassifier
+KNN_PARAMS = ['n_neighbors', 'weights', 'algorithm', 'leaf_size', 'p', 'metric']
+
+# Training metrics copied from the legacy *_metadata.json
+METRIC_KEYS = ['model_name', 'train_accuracy', 'test_accuracy', 'precision',
+               'recall', 'f1_score', 'roc_auc', 'training_time', 'prediction_time']
+
+
+class ArtifactError(ValueError):
+    """Raised when an artifact is missing, corrupted or does not match the schema."""
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_legacy_scaler():
+    """Recreate the input scaler used with the legacy joblib model."""
+    # Create a scaler fitted to the original data range
+    # Wisconsin dataset features are already in range 1-10, so we need to recreate the scaler
+    # that was used during training
+    from sklearn.preprocessing import StandardScaler
+
+    # Approximate the original data statistics for scaling
+    # These are representative values from the Wisconsin dataset
+    scaler = StandardScaler()
+    # Fit scaler with representative data (features range 1-10)
+    sample_data = np.array([
+        [1, 1, 1, 1, 1, 1, 1, 1, 1],  # Min values
+        [10, 10, 10, 10, 10, 10, 10, 10, 10],  # Max values
+        [5, 3, 3, 3, 3, 3, 3, 3, 1],  # Typical benign
+        [8, 7, 8, 7, 6, 9, 7, 8, 3],  # Typical malignant
+        [3, 1, 1, 1, 2, 1, 3, 1, 1],  # Another benign
+        [4, 2, 1, 1, 2, 1, 2, 1, 1],  # Another benign
+        [6, 8, 8, 1, 3, 4, 3, 7, 1],  # Borderline
+    ])
+    scaler.fit(sample_data)
+    return scaler
+
+
+def find_legacy_model(models_dir, prefix='KNN'):
+    """Return (model_path, metadata_path) of the ``<prefix>_*.joblib`` model, or None."""
+    names = sorted(os.listdir(models_dir))
+    models = [name for name in names if name.startswith(f'{prefix}_') and name.endswith('.joblib')]
+    if not models:
+        return None
+    metadata = models[-1][:-len('.joblib')] + '_metadata.json'
+    if metadata not in names:
+        return None
+    return os.path.join(models_dir, models[-1]), os.path.join(models_dir, metadata)
+
+
+def find_artifact(models_dir, prefix='KNN'):
+    """Return the newest artifact directory named ``<prefix>_*`` in models_dir, or None."""
+    candidates = sorted(
+        name for name in os.listdir(models_dir)
+        if name.startswith(prefix) and os.path.isfile(os.path.join(models_dir, name, MANIFEST_NAME))
+    )
+    return os.path.join(models_dir, candidates[-1]) if candidates else None
+
+
+def recover_raw_features(fit_X):
+    """Undo the training StandardScaler on the stored points.
+
+    Raw features are integers 1-10 and every column of the training set
+    contains a 1, so each scaled column is ``(raw - mu) / sigma`` with the
+    smallest gap between distinct values equal to ``1 / sigma``.
+    """
+    raw = np.empty(fit_X.shape, dtype=np.int64)
+    for j in range(fit_X.shape[1]):
+        column = np.asarray(fit_X[:, j])
+        values = np.unique(column)
+        step = np.diff(values).min() if len(values) > 1 else 1.0
+        raw[:, j] = np.rint((column - values[0]) / step).astype(np.int64) + 1
+    return raw
+
+
+def training_baseline(fit_X, y):
+    """Per-feature 10-bin histograms, mean/variance and class counts of the training set."""
+    raw = recover_raw_features(fit_X)
+    if raw.min() < 1 or raw.max() > 10:
+        raise ArtifactError('Could not recover raw 1-10 training features')
+    return {
+        'samples': int(len(raw)),
+        'histograms': [np.bincount(raw[:, j] - 1, minlength=10).tolist() for j in range(raw.shape[1])],
+        'mean': raw.mean(axis=0).tolist(),
+        'var': raw.var(axis=0).tolist(),
+        'class_counts': {str(int(label)): int(np.sum(y == label)) for label in np.unique(y)}
+    }
+
+
+def export_knn_artifact(model, scaler, metadata, models_dir):
+    """Write a fitted KNN model and its scaler as an artifact directory."""
+    version = f"{metadata['model_name']}_{metadata['timestamp']}"
+    artifact_dir = os.path.join(models_dir, version)
+    os.makedirs(artifact_dir, exist_ok=True)
+
+    arrays = {
+        'fit_X': np.ascontiguousarray(model._fit_X, dtype=np.float64),
+        'y': np.ascontiguousarray(model.classes_[model._y]),
+        'scaler_mean': np.ascontiguousarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.ascontiguousarray(scaler.scale_, dtype=np.float64),
+    }
+
+    array_entries = {}
+    for name, array in arrays.items():
+        filename = f'{name}.npy'
+        path = os.path.join(artifact_dir, filename)
+        np.save(path, array, allow_pickle=False)
+        array_entries[name] = {
+            'file': filename,
+            'sha256': sha256_file(path),
+            'dtype': array.dtype.str,
+            'shape': list(array.shape)
+        }
+
+    results = metadata.get('results', {})
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_name': metadata['model_name'],
+        'model_type': 'KNeighborsClassifier',
+        'version': version,
+        'timestamp': metadata['timestamp'],
+        'params': {key: model.get_params()[key] for key in KNN_PARAMS},
+        'feature_schema': {
+            'names': FEATURE_NAMES,
+            'min': 1,
+            'max': 10
+        },
+        'classes': [int(label) for label in model.classes_],
+        'metrics': {key: results[key] for key in METRIC_KEYS if key in results},
+        'training_baseline': training_baseline(arrays['fit_X'], arrays['y']),
+        'arrays': array_entries
+    }
+    with open(os.path.join(artifact_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return artifact_dir
+
+
+def load_manifest(artifact_dir):
+    """Read and check the manifest of an artifact directory."""
+    try:
+        with open(os.path.join(artifact_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f'Unreadable manifest in {artifact_dir}: {e}')
+
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format {manifest.get('format_version')!r}")
+    if manifest.get('model_type') != 'KNeighborsClassifier':
+        raise ArtifactError(f"Unsupported model type {manifest.get('model_type')!r}")
+    if manifest.get('feature_schema', {}).get('names') != FEATURE_NAMES:
+        raise ArtifactError('Artifact feature schema does not match the API features')
+    return manifest
+
+
+def load_arrays(artifact_dir, manifest):
+    """Verify and memory-map every array listed in the manifest."""
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        path = os.path.join(artifact_dir, os.path.basename(entry['file']))
+        if not os.path.isfile(path):
+            raise ArtifactError(f'Missing array file {path}')
+        if sha256_file(path) != entry['sha256']:
+            raise ArtifactError(f'Checksum mismatch for {path}')
+        array = np.load(path, mmap_mode='r', allow_pickle=False)
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ArtifactError(f'Array {name} is {array.dtype.str}{list(array.shape)}, '
+                                f"manifest says {entry['dtype']}{entry['shape']}")
+        arrays[name] = array
+    return arrays
+
+
+def load_knn_artifact(artifact_dir):
+    """Load a KNN artifact; returns (model, scaler, manifest).
+
+    Raises ArtifactError if the artifact is corrupted or inconsistent.
+    """
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    manifest = load_manifest(artifact_dir)
+    arrays = load_arrays(artifact_dir, manifest)
+    n_features = len(FEATURE_NAMES)
+
+    fit_X, y = arrays['fit_X'], arrays['y']
+    if fit_X.ndim != 2 or fit_X.shape[1] != n_features or len(y) != len(fit_X):
+        raise ArtifactError('Training arrays do not match the feature schema')
+    if sorted(np.unique(y).tolist()) != manifest['classes']:
+        raise ArtifactError('Training labels do not match the manifest classes')
+
+    # Rebuilding the neighbour index from the mapped points is a
+    # millisecond-scale operation at this dataset size
+    model = KNeighborsClassifier(**manifest['params'])
+    model.fit(fit_X, y)
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(arrays['scaler_mean'])
+    scaler.scale_ = np.array(arrays['scaler_scale'])
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = n_features
+    if scaler.mean_.shape != (n_features,) or scaler.scale_.shape != (n_features,):
+        raise ArtifactError('Scaler arrays do not match the feature schema')
+
+    return model, scaler, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KNN model artifact tools')
+    parser.add_argument('command', choices=['export', 'verify'])
+    parser.add_argument('--models-dir', default=os.path.normpath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Models')))
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        import joblib
+        legacy = find_legacy_model(args.models_dir)
+        if legacy is None:
+            print(f"❌ No legacy KNN model found in {args.models_dir}")
+            return 1
+        model = joblib.load(legacy[0])
+        with open(legacy[1]) as f:
+            metadata = json.load(f)
+        artifact_dir = export_knn_artifact(model, build_legacy_scaler(), metadata, args.models_dir)
+        print(f"✅ Artifact written to {artifact_dir}")
+        return 0
+
+    artifact_dir = find_artifact(args.models_dir)
+    if artifact_dir is None:
+        print(f"❌ No artifact found in {args.models_dir}")
+        return 1
+    try:
+        _, _, manifest = load_knn_artifact(artifact_dir)
+    except ArtifactError as e:
+        print(f"❌ {artifact_dir}: {e}")
+        return 1
+    print(f"✅ {artifact_dir}: {manifest['version']} OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""
+Admin Authentication
+====================
+
+Token check shared by the admin-only endpoints (``/admin/*`` and
+``DELETE /stats/drift``) and forced request profiling.
+
+Configuration (environment variables):
+
+- ``ADMIN_TOKEN``: token expected in the ``X-Admin-Token`` header; unset
+  disables every admin-only operation
+"""
+
+import os
+import hmac
+
+from flask import request
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+
+def is_admin():
+    """True if the request carries the configured admin token."""
+    token = request.headers.get('X-Admin-Token')
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
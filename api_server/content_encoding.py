@@ -0,0 +1,150 @@
+"""
+Compressed Transport
+====================
+
+Negotiated gzip / zstd compression of request and response bodies.
+
+Requests: a body sent with ``Content-Encoding: gzip`` (or ``zstd``) is
+decompressed by a WSGI middleware before Flask parses it, so every route
+(and the admission cost check) sees plain JSON. Decompressed size is capped
+to guard against decompression bombs.
+
+Responses: bodies of at least ``COMPRESS_MIN_BYTES`` are compressed with the
+best encoding the client lists in ``Accept-Encoding`` (zstd, then gzip).
+Small bodies such as single predictions are sent as-is, where compression
+costs more than it saves. Streamed responses (job results) are left alone.
+A compressed response's ETag is made weak, so ``If-None-Match`` still
+matches whichever encoding the client cached.
+
+zstd requires the optional ``zstandard`` package; without it only gzip is
+offered and zstd request bodies are rejected with 415.
+
+Configuration (environment variables):
+
+- ``COMPRESS_RESPONSES``: ``0`` disables response compression (default 1)
+- ``COMPRESS_MIN_BYTES``: smallest response body compressed (default 1024)
+- ``COMPRESS_GZIP_LEVEL``: gzip level (default 6)
+- ``COMPRESS_ZSTD_LEVEL``: zstd level (default 3)
+- ``MAX_DECOMPRESSED_BYTES``: cap on a decompressed request body (default 64 MiB)
+"""
+
+import io
+import os
+import gzip
+import json
+
+from flask import request
+
+try:
+    import zstandard
+except ImportError:  # gzip only
+    zstandard = None
+
+COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '1') != '0'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_ZSTD_LEVEL = int(os.environ.get('COMPRESS_ZSTD_LEVEL', '3'))
+MAX_DECOMPRESSED_BYTES = int(os.environ.get('MAX_DECOMPRESSED_BYTES', str(64 * 1024 * 1024)))
+
+
+class BodyTooLarge(ValueError):
+    """A request body decompresses to more than MAX_DECOMPRESSED_BYTES."""
+
+
+def supported_encodings():
+    """Encodings this server can read and write, in order of preference."""
+    return ['zstd', 'gzip'] if zstandard is not None else ['gzip']
+
+
+def decompress_stream(stream, encoding, limit=MAX_DECOMPRESSED_BYTES):
+    """Read a compressed stream; raises BodyTooLarge past ``limit`` bytes."""
+    if encoding == 'gzip':
+        reader = gzip.GzipFile(fileobj=stream)
+    elif encoding == 'zstd' and zstandard is not None:
+        reader = zstandard.ZstdDecompressor().stream_reader(stream)
+    else:
+        raise LookupError(encoding)
+    data = reader.read(limit + 1)
+    if len(data) > limit:
+        raise BodyTooLarge(f'Decompressed body exceeds {limit} bytes')
+    return data
+
+
+def compress(data, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=COMPRESS_ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+class DecompressingMiddleware:
+    """Replace a compressed request body with its decompressed bytes."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding and encoding != 'identity':
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+                body = environ['wsgi.input'].read(length) if length else environ['wsgi.input'].read()
+                data = decompress_stream(io.BytesIO(body), encoding)
+            except LookupError:
+                return self._error(environ, start_response, '415 Unsupported Media Type',
+                                   f'Unsupported Content-Encoding: {encoding}',
+                                   supported=supported_encodings())
+            except BodyTooLarge as e:
+                return self._error(environ, start_response, '413 Request Entity Too Large', str(e))
+            except (OSError, EOFError, ValueError) as e:
+                # zstandard.ZstdError subclasses ValueError
+                return self._error(environ, start_response, '400 Bad Request', f'Could not decompress request body: {e}')
+            environ['wsgi.input'] = io.BytesIO(data)
+            environ['CONTENT_LENGTH'] = str(len(data))
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _error(environ, start_response, status, message, **extra):
+        body = json.dumps({'error': message, 'status': 'error', **extra}).encode('utf-8')
+        headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]
+        # Sent before flask-cors runs: echo the origin as CORS(app) does, so
+        # browsers let the frontend read the error
+        if environ.get('HTTP_ORIGIN'):
+            headers += [('Access-Control-Allow-Origin', environ['HTTP_ORIGIN']), ('Vary', 'Origin')]
+        start_response(status, headers)
+        return [body]
+
+
+def _accepted_encoding():
+    """Best supported encoding from Accept-Encoding, or None."""
+    accepted = request.accept_encodings
+    for encoding in supported_encodings():
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    if (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Install request decompression and, unless disabled, response compression."""
+    app.wsgi_app = DecompressingMiddleware(app.wsgi_app)
+    if COMPRESS_RESPONSES:
+        app.after_request(compress_response)
@@ -32,7 +32,7 @@ echo    4. Settings:
 echo       - Name: knn-cancer-prediction
 echo       - Environment: Python 3
 echo       - Build Command: pip install -r requirements.txt
-echo       - Start Command: gunicorn -w 4 -b 0.0.0.0:$PORT app:app
+echo       - Start Command: gunicorn -w 4 --threads 4 -b 0.0.0.0:$PORT app:app
 echo       - Plan: Free
 echo    5. Click "Create Web Service"
 echo    6. Wait 5-10 minutes for deployment
@@ -46,7 +46,7 @@ echo "2. Connect your GitHub repository"
 echo "3. Create new Web Service"
 echo "4. Use these settings:"
 echo "   - Build Command: pip install -r requirements.txt"
-echo "   - Start Command: gunicorn -w 4 -b 0.0.0.0:\$PORT app:app"
+echo "   - Start Command: gunicorn -w 4 --threads 4 -b 0.0.0.0:\$PORT app:app"
 echo "   - Environment: Python 3"
 echo "   - Plan: Free"
 echo ""
@@ -0,0 +1,180 @@
+"""
+Input Drift Statistics
+======================
+
+Constant-memory statistics of the feature values production traffic sends,
+compared against the training distribution stored with the model.
+
+All gunicorn workers update one set of counters in a named shared memory
+block (per-process memory if shared memory is unavailable):
+
+- exact 10-bin histograms per feature (inputs are 1-10)
+- running sum and sum of squares per feature, for mean and variance
+- counts of benign / malignant predictions
+
+Each request adds its samples with a few vectorized numpy operations under
+a short lock, so the cost on ``/predict`` is a few microseconds. Drift is
+reported per feature as the Population Stability Index (PSI) between the
+production and training histograms.
+
+Configuration (environment variables):
+
+- ``DRIFT_STATS``: ``0`` disables collection (default 1)
+- ``DRIFT_STATS_NAME``: shared memory block name (default ``knn_drift_stats``)
+"""
+
+import os
+
+import numpy as np
+
+from prediction_cache import SharedLock, open_shared_block, version_tag
+
+DRIFT_STATS = os.environ.get('DRIFT_STATS', '1') != '0'
+DRIFT_STATS_NAME = os.environ.get('DRIFT_STATS_NAME', 'knn_drift_stats')
+
+N_FEATURES = 9
+N_BINS = 10
+PSI_EPSILON = 1e-4
+
+# Counter layout (float64): version tag, sample count, benign, malignant,
+# per-feature sums, per-feature sums of squares, per-feature histograms
+VERSION, COUNT, BENIGN, MALIGNANT = 0, 1, 2, 3
+SUMS = slice(4, 4 + N_FEATURES)
+SUMSQ = slice(4 + N_FEATURES, 4 + 2 * N_FEATURES)
+HIST = slice(4 + 2 * N_FEATURES, 4 + 2 * N_FEATURES + N_FEATURES * N_BINS)
+N_COUNTERS = HIST.stop
+
+FEATURE_OFFSETS = np.arange(N_FEATURES) * N_BINS
+
+_counters = None
+_block = None
+_baseline = None
+_locked = SharedLock(DRIFT_STATS_NAME)
+
+
+def init_drift(baseline, model_version):
+    """Attach the shared counters and set the training baseline.
+
+    Counters recorded under a different model version are reset.
+    """
+    global _counters, _block, _baseline
+    _baseline = baseline
+    if not DRIFT_STATS:
+        return
+
+    if _counters is None:
+        try:
+            _block = open_shared_block(DRIFT_STATS_NAME, N_COUNTERS * 8)
+            _counters = np.ndarray((N_COUNTERS,), dtype=np.float64, buffer=_block.buf)
+        except Exception as e:
+            print(f"⚠️  Shared drift counters unavailable, using per-worker counters: {e}")
+            _counters = np.zeros(N_COUNTERS, dtype=np.float64)
+
+    tag = float(version_tag(model_version))
+    with _locked:
+        if _counters[VERSION] != tag:
+            _counters[:] = 0
+            _counters[VERSION] = tag
+
+
+def update(samples, predictions):
+    """Add served samples (n x 9, values 1-10) and their predicted labels."""
+    if _counters is None:
+        return
+    try:
+        X = np.asarray(samples, dtype=np.float64).reshape(-1, N_FEATURES)
+        predictions = np.asarray(predictions).reshape(-1)
+    except (TypeError, ValueError):
+        return
+
+    bins = np.clip(np.rint(X), 1, N_BINS).astype(np.int64) - 1 + FEATURE_OFFSETS
+    hist = np.bincount(bins.ravel(), minlength=N_FEATURES * N_BINS)
+    malignant = int(np.count_nonzero(predictions == 4))
+
+    with _locked:
+        _counters[COUNT] += len(X)
+        _counters[BENIGN] += len(predictions) - malignant
+        _counters[MALIGNANT] += malignant
+        _counters[SUMS] += X.sum(axis=0)
+        _counters[SUMSQ] += np.square(X).sum(axis=0)
+        _counters[HIST] += hist
+
+
+def reset():
+    if _counters is None:
+        return
+    with _locked:
+        tag = _counters[VERSION]
+        _counters[:] = 0
+        _counters[VERSION] = tag
+
+
+def psi(observed, expected):
+    """Population Stability Index between two histograms (counts)."""
+    p = np.asarray(observed, dtype=np.float64)
+    q = np.asarray(expected, dtype=np.float64)
+    p = np.maximum(p / max(p.sum(), 1), PSI_EPSILON)
+    q = np.maximum(q / max(q.sum(), 1), PSI_EPSILON)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def _drift_level(score):
+    if score < 0.1:
+        return 'stable'
+    if score < 0.25:
+        return 'moderate'
+    return 'significant'
+
+
+def report(feature_names):
+    """Production statistics and drift scores against the training baseline."""
+    if _counters is None:
+        return {'enabled': False}
+    with _locked:
+        snapshot = _counters.copy()
+
+    n = snapshot[COUNT]
+    hist = snapshot[HIST].reshape(N_FEATURES, N_BINS)
+    mean = snapshot[SUMS] / n if n else np.zeros(N_FEATURES)
+    var = np.maximum(snapshot[SUMSQ] / n - mean ** 2, 0) if n else np.zeros(N_FEATURES)
+
+    features = {}
+    scores = []
+    for j, name in enumerate(feature_names):
+        entry = {
+            'histogram': hist[j].astype(int).tolist(),
+            'mean': round(float(mean[j]), 4),
+            'variance': round(float(var[j]), 4)
+        }
+        if _baseline and n:
+            score = psi(hist[j], _baseline['histograms'][j])
+            scores.append(score)
+            entry.update({
+                'training_mean': round(_baseline['mean'][j], 4),
+                'training_variance': round(_baseline['var'][j], 4),
+                'psi': round(score, 4),
+                'drift': _drift_level(score)
+            })
+        features[name] = entry
+
+    predicted = snapshot[BENIGN] + snapshot[MALIGNANT]
+    class_rates = {
+        'benign': round(float(snapshot[BENIGN] / predicted), 4) if predicted else None,
+        'malignant': round(float(snapshot[MALIGNANT] / predicted), 4) if predicted else None
+    }
+    result = {
+        'enabled': True,
+        'samples': int(n),
+        'class_rates': class_rates,
+        'features': features
+    }
+    if _baseline:
+        total = _baseline['samples']
+        result['training_class_rates'] = {
+            'benign': round(_baseline['class_counts'].get('2', 0) / total, 4),
+            'malignant': round(_baseline['class_counts'].get('4', 0) / total, 4)
+        }
+    if scores:
+        result['drift_score'] = round(max(scores), 4)
+        result['drift'] = _drift_level(max(scores))
+    return result
@@ -0,0 +1,404 @@
+"""
+Batch Prediction Jobs
+=====================
+
+Background job subsystem for batches too large for ``/predict/batch``.
+
+A submitted batch is spooled to disk, processed in fixed-size chunks by a
+small thread pool and its results are appended to a JSON Lines file, so
+memory stays bounded regardless of batch size. Job state lives entirely in
+the job directory, which lets any gunicorn worker answer status and result
+requests for a job another worker is processing.
+
+Job directory layout (``<JOBS_DIR>/<job_id>/``):
+
+- ``input.csv``: one sample per line, 9 comma-separated numbers
+- ``status.json``: state, progress counters and timestamps
+- ``results.jsonl``: one result object per processed sample
+
+Jobs run in the thread pool of the worker that accepted them. That worker
+records itself (host and pid) as the job's owner and refreshes a heartbeat
+in ``status.json`` while the job is unfinished. If the worker dies (for
+example killed at the gunicorn timeout), any live worker notices the stale
+heartbeat or the dead pid - on startup, on its periodic heartbeat, or when
+the job's status is requested - and re-claims the job from the start, up to
+``JOBS_MAX_ATTEMPTS`` times; after that the job is marked failed.
+
+Configuration (environment variables):
+
+- ``JOBS_DIR``: spool directory (default ``<tmp>/knn_jobs``)
+- ``JOBS_WORKERS``: background threads per server worker (default 2)
+- ``JOBS_CHUNK_SIZE``: samples predicted per vectorized call (default 1000)
+- ``JOBS_RETENTION_HOURS``: finished jobs older than this are deleted (default 24)
+- ``JOBS_MAX_PENDING``: queued or running jobs per server worker before new
+  submissions are refused (default 20)
+- ``JOBS_HEARTBEAT_SECONDS``: how often owners refresh their jobs (default 10)
+- ``JOBS_STALE_SECONDS``: heartbeat age after which a job is re-claimed (default 60)
+- ``JOBS_MAX_ATTEMPTS``: runs of a job before it is marked failed (default 3)
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import shutil
+import tempfile
+import threading
+import traceback
+from datetime import datetime
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from prediction_cache import SharedLock, pid_alive
+
+JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'knn_jobs'))
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', '2'))
+JOBS_CHUNK_SIZE = int(os.environ.get('JOBS_CHUNK_SIZE', '1000'))
+JOBS_RETENTION_HOURS = float(os.environ.get('JOBS_RETENTION_HOURS', '24'))
+JOBS_MAX_PENDING = int(os.environ.get('JOBS_MAX_PENDING', '20'))
+JOBS_HEARTBEAT_SECONDS = float(os.environ.get('JOBS_HEARTBEAT_SECONDS', '10'))
+JOBS_STALE_SECONDS = float(os.environ.get('JOBS_STALE_SECONDS', '60'))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', '3'))
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+N_FEATURES = 9
+UNFINISHED_STATES = ('queued', 'running')
+HOSTNAME = socket.gethostname()
+
+# Set by init_jobs(): callable taking an (n, 9) array and returning
+# (predictions, prob_benign, prob_malignant) arrays
+_predict_fn = None
+_executor = None
+_pending_lock = threading.Lock()
+_pending_jobs = 0
+
+# Status of the unfinished jobs this process owns; guarded by _status_lock
+_owned = {}
+_status_lock = threading.Lock()
+# Serializes re-claiming stale jobs across workers
+_claim_lock = SharedLock('knn_jobs_claim')
+_heartbeat = None
+
+
+def init_jobs(predict_fn):
+    """Register the vectorized predict function and start the thread pool."""
+    global _predict_fn, _executor, _heartbeat
+    _predict_fn = predict_fn
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix='knn-job')
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    if _heartbeat is None:
+        _heartbeat = threading.Thread(target=_heartbeat_loop, name='knn-job-heartbeat', daemon=True)
+        _heartbeat.start()
+    _recover_stale_jobs()
+
+
+def _job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _write_status(job_id, status):
+    """Atomically replace a job's status file."""
+    path = os.path.join(_job_dir(job_id), 'status.json')
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def _update(job_id, **changes):
+    """Apply changes to an owned job's status and write it with a fresh heartbeat."""
+    with _status_lock:
+        status = _owned[job_id]
+        status.update(changes, heartbeat_at=time.time())
+        _write_status(job_id, status)
+        return dict(status)
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(JOBS_HEARTBEAT_SECONDS)
+        try:
+            with _status_lock:
+                for job_id, status in list(_owned.items()):
+                    status['heartbeat_at'] = time.time()
+                    _write_status(job_id, status)
+            _recover_stale_jobs()
+        except Exception:
+            traceback.print_exc()
+
+
+def _is_stale(job_id, status):
+    """True for an unfinished job whose owner is gone."""
+    if status.get('state') not in UNFINISHED_STATES or job_id in _owned:
+        return False
+    if time.time() - (status.get('heartbeat_at') or 0) > JOBS_STALE_SECONDS:
+        return True
+    # Same host: a dead pid (or our own pid, reused after a restart) is conclusive
+    return status.get('owner_host') == HOSTNAME and (
+        status.get('owner_pid') == os.getpid() or not pid_alive(status.get('owner_pid')))
+
+
+def _recover_job(job_id):
+    """Re-claim a stale job, or mark it failed once it ran out of attempts."""
+    global _pending_jobs
+    with _claim_lock:
+        status = get_status(job_id, recover=False)
+        if status is None or not _is_stale(job_id, status):
+            return
+        attempts = status.get('attempts', 1)
+        if attempts >= JOBS_MAX_ATTEMPTS or _executor is None:
+            status.update({
+                'state': 'failed',
+                'error': f'Server worker stopped while processing the job ({attempts} attempts)',
+                'finished_at': datetime.now().isoformat()
+            })
+            _write_status(job_id, status)
+            return
+        print(f"♻️  Re-claiming job {job_id} from {status.get('owner_host')}:{status.get('owner_pid')}")
+        status.update({
+            'state': 'queued',
+            'processed_samples': 0,
+            'failed_samples': 0,
+            'started_at': None,
+            'error': None,
+            'attempts': attempts + 1,
+            'owner_host': HOSTNAME,
+            'owner_pid': os.getpid(),
+            'heartbeat_at': time.time()
+        })
+        with _status_lock:
+            _owned[job_id] = status
+            _write_status(job_id, status)
+    with _pending_lock:
+        _pending_jobs += 1
+    _executor.submit(_run_job, job_id)
+
+
+def _recover_stale_jobs():
+    try:
+        entries = os.listdir(JOBS_DIR)
+    except FileNotFoundError:
+        return
+    for job_id in entries:
+        status = get_status(job_id, recover=False)
+        if status is not None and _is_stale(job_id, status):
+            _recover_job(job_id)
+
+
+def _cleanup_expired():
+    """Delete finished jobs, and unfinished ones with a dead heartbeat, past the retention window."""
+    cutoff = time.time() - JOBS_RETENTION_HOURS * 3600
+    try:
+        entries = os.listdir(JOBS_DIR)
+    except FileNotFoundError:
+        return
+    for job_id in entries:
+        status_path = os.path.join(_job_dir(job_id), 'status.json')
+        try:
+            if os.path.getmtime(status_path) >= cutoff:
+                continue
+            with open(status_path) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if status.get('state') in ('completed', 'failed') or (
+                job_id not in _owned and (status.get('heartbeat_at') or 0) < cutoff):
+            shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+
+def _count_rows(path):
+    with open(path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def is_saturated():
+    """True when this worker already has JOBS_MAX_PENDING unfinished jobs."""
+    return JOBS_MAX_PENDING > 0 and _pending_jobs >= JOBS_MAX_PENDING
+
+
+def _start_job(job_id, total_samples, source):
+    global _pending_jobs
+    status = {
+        'job_id': job_id,
+        'state': 'queued',
+        'source': source,
+        'total_samples': total_samples,
+        'processed_samples': 0,
+        'failed_samples': 0,
+        'created_at': datetime.now().isoformat(),
+        'started_at': None,
+        'finished_at': None,
+        'error': None,
+        'attempts': 1,
+        'owner_host': HOSTNAME,
+        'owner_pid': os.getpid(),
+        'heartbeat_at': time.time()
+    }
+    with _status_lock:
+        _owned[job_id] = status
+        _write_status(job_id, status)
+    with _pending_lock:
+        _pending_jobs += 1
+    _executor.submit(_run_job, job_id)
+    return status
+
+
+def submit_samples(samples):
+    """Spool a list of samples to disk and queue a job. Returns its status."""
+    _cleanup_expired()
+    job_id = uuid.uuid4().hex
+    os.makedirs(_job_dir(job_id))
+    with open(os.path.join(_job_dir(job_id), 'input.csv'), 'w') as f:
+        for sample in samples:
+            if isinstance(sample, list):
+                f.write(','.join(str(value) for value in sample))
+            else:
+                f.write(json.dumps(sample).replace('\n', ' '))
+            f.write('\n')
+    return _start_job(job_id, len(samples), 'json')
+
+
+def submit_file(file_storage):
+    """Save an uploaded CSV file to disk and queue a job. Returns its status."""
+    _cleanup_expired()
+    job_id = uuid.uuid4().hex
+    os.makedirs(_job_dir(job_id))
+    input_path = os.path.join(_job_dir(job_id), 'input.csv')
+    file_storage.save(input_path)
+
+    # Drop a header row such as "clump_thickness,uniform_cell_size,..."
+    with open(input_path) as f:
+        first_line = f.readline()
+    if re.search(r'[A-Za-z_]', first_line):
+        with open(input_path) as src, open(f'{input_path}.tmp', 'w') as dst:
+            next(src)
+            shutil.copyfileobj(src, dst)
+        os.replace(f'{input_path}.tmp', input_path)
+
+    return _start_job(job_id, _count_rows(input_path), 'upload')
+
+
+def _parse_row(line):
+    """Parse one CSV line into 9 floats in 1-10, or return an error message."""
+    try:
+        values = [float(value) for value in line.split(',')]
+    except ValueError:
+        return None, 'Sample must be a list of 9 numbers'
+    if len(values) != N_FEATURES:
+        return None, 'Sample must be a list of 9 numbers'
+    for i, value in enumerate(values):
+        if not (1 <= value <= 10):
+            return None, f'Feature {i+1} must be a number between 1 and 10'
+    return values, None
+
+
+def _run_job(job_id):
+    """Process a job's input file chunk by chunk, appending to results.jsonl."""
+    global _pending_jobs
+    try:
+        _process_job(job_id)
+    finally:
+        with _status_lock:
+            _owned.pop(job_id, None)
+        with _pending_lock:
+            _pending_jobs -= 1
+
+
+def _process_job(job_id):
+    _update(job_id, state='running', started_at=datetime.now().isoformat())
+    failed_samples = 0
+
+    try:
+        input_path = os.path.join(_job_dir(job_id), 'input.csv')
+        results_path = os.path.join(_job_dir(job_id), 'results.jsonl')
+        sample_index = 0
+
+        with open(input_path) as src, open(results_path, 'w') as out:
+            rows = (line for line in src if line.strip())
+            while True:
+                chunk = list(islice(rows, JOBS_CHUNK_SIZE))
+                if not chunk:
+                    break
+
+                parsed = [_parse_row(line) for line in chunk]
+                valid = [values for values, error in parsed if error is None]
+                if valid:
+                    predictions, prob_benign, prob_malignant = _predict_fn(np.array(valid))
+                    predictions = iter(zip(predictions, prob_benign, prob_malignant))
+
+                lines = []
+                for values, error in parsed:
+                    sample_index += 1
+                    if error is not None:
+                        failed_samples += 1
+                        lines.append(json.dumps({'sample_index': sample_index, 'error': error}))
+                        continue
+                    prediction, benign, malignant = next(predictions)
+                    lines.append(json.dumps({
+                        'sample_index': sample_index,
+                        'diagnosis': 'Benign' if prediction == 2 else 'Malignant',
+                        'confidence': round(float(max(benign, malignant)), 3),
+                        'raw_prediction': int(prediction),
+                        'probabilities': {
+                            'benign': round(float(benign), 3),
+                            'malignant': round(float(malignant), 3)
+                        }
+                    }))
+                out.write('\n'.join(lines) + '\n')
+                out.flush()
+
+                _update(job_id, processed_samples=sample_index, failed_samples=failed_samples)
+
+        final = {'state': 'completed'}
+    except Exception as e:
+        traceback.print_exc()
+        final = {'state': 'failed', 'error': str(e)}
+
+    _update(job_id, finished_at=datetime.now().isoformat(), **final)
+
+
+def is_valid_job_id(job_id):
+    return bool(JOB_ID_PATTERN.match(job_id))
+
+
+def get_status(job_id, recover=True):
+    """Return the status dict for ``job_id``, or None if it does not exist.
+
+    A job whose owner has died is re-claimed (or failed) before returning.
+    """
+    if not is_valid_job_id(job_id):
+        return None
+    path = os.path.join(_job_dir(job_id), 'status.json')
+    try:
+        with open(path) as f:
+            status = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if recover and _is_stale(job_id, status):
+        _recover_job(job_id)
+        return get_status(job_id, recover=False)
+    return status
+
+
+def iter_result_lines(job_id, offset=0, limit=None):
+    """Yield raw JSON lines of already-written results, starting at ``offset``."""
+    results_path = os.path.join(_job_dir(job_id), 'results.jsonl')
+    if not os.path.exists(results_path):
+        return
+    with open(results_path) as f:
+        stop = None if limit is None else offset + limit
+        for line in islice(f, offset, stop):
+            # A chunk still being written may end in a partial line
+            if not line.endswith('\n'):
+                return
+            yield line
+
+
+def get_results(job_id, offset, limit):
+    """Return one page of results as a list of dicts."""
+    return [json.loads(line) for line in iter_result_lines(job_id, offset, limit)]
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Model Selection Report
+======================
+
+Puts the accuracy recorded for every model in ``Models/`` next to what it
+costs to serve on this machine, so the serving model is chosen on evidence.
+
+For every ``*_metadata.json`` / ``.joblib`` pair (and every verified KNN
+artifact directory) the report measures:
+
+- load time
+- memory retained after loading (Python allocations traced during load)
+  and size on disk; each model is loaded once untimed first, so the one-off
+  import of its estimator's sklearn modules is not charged to whichever
+  model happens to be discovered first
+- single-row latency (p50 / p99) and batch latency per sample, timed through
+  the served scaler and ``predict_proba`` exactly as the API calls them
+
+and marks the servable models on the accuracy-vs-latency Pareto front: no
+other servable model is at least as accurate and at least as fast. Models
+without ``predict_proba`` (the SVMs were trained without probabilities) are
+reported but cannot be served, so they are left off the front.
+
+Usage:
+
+    python model_report.py                          # table
+    python model_report.py --json report.json       # report somewhere other than MODEL_REPORT
+    python model_report.py --select auto            # write the best Pareto model as default
+    python model_report.py --select "Random Forest"
+
+Every run saves the report to ``model_report.json`` (``MODEL_REPORT``), which
+``/admin/models/report`` serves; the benchmark itself never runs inside the
+API server, where live request threads would skew the timings and memory.
+The selection is written to ``server_config.json`` (``SERVER_CONFIG``), read
+by ``app.py`` at startup; ``SERVING_MODEL`` overrides it.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import joblib
+
+import artifacts
+
+SERVER_CONFIG = os.environ.get(
+    'SERVER_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server_config.json'))
+MODEL_REPORT = os.environ.get(
+    'MODEL_REPORT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_report.json'))
+
+METRICS = ['test_accuracy', 'f1_score', 'roc_auc']
+
+
+def read_server_config(path=SERVER_CONFIG):
+    """Settings written by this tool, or {} if there are none."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(data, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def write_server_config(updates, path=SERVER_CONFIG):
+    config = read_server_config(path)
+    config.update(updates)
+    _write_json(config, path)
+    return config
+
+
+def read_report(path=MODEL_REPORT):
+    """Last report saved by this tool, or None if it has not been run."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def discover_models(models_dir):
+    """List (name, format, path, metrics) for every loadable model in models_dir."""
+    candidates = []
+    for filename in sorted(os.listdir(models_dir)):
+        path = os.path.join(models_dir, filename)
+        if filename.endswith('_metadata.json'):
+            model_path = path[:-len('_metadata.json')] + '.joblib'
+            if not os.path.isfile(model_path):
+                continue
+            with open(path) as f:
+                metadata = json.load(f)
+            candidates.append((metadata['model_name'], 'joblib', model_path, metadata.get('results', {})))
+        elif os.path.isfile(os.path.join(path, artifacts.MANIFEST_NAME)):
+            try:
+                manifest = artifacts.load_manifest(path)
+            except artifacts.ArtifactError as e:
+                print(f"⚠️  Skipping artifact {path}: {e}")
+                continue
+            candidates.append((manifest['model_name'], 'artifact', path, manifest.get('metrics', {})))
+    return candidates
+
+
+def is_servable(model):
+    """The API needs class probabilities for every prediction path."""
+    return hasattr(model, 'predict_proba')
+
+
+def _load(model_format, path):
+    if model_format == 'artifact':
+        return artifacts.load_knn_artifact(path)[0]
+    return joblib.load(path)
+
+
+def _disk_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def benchmark_model(model_format, path, scaler, X, repeats=200, batch_size=1000):
+    """Load one model and time it; returns a dict of measurements."""
+    # Untimed load first: importing the estimator's modules is a one-off cost
+    _load(model_format, path)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = _load(model_format, path)
+    load_seconds = time.perf_counter() - start
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    result = {
+        'servable': is_servable(model),
+        'load_ms': round(load_seconds * 1000, 2),
+        'memory_kb': round(memory_bytes / 1024, 1),
+        'disk_kb': round(_disk_bytes(path) / 1024, 1)
+    }
+    predict = model.predict_proba if result['servable'] else model.predict
+
+    # Warm up caches and lazily built structures before timing
+    predict(scaler.transform(X[:1]))
+
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        predict(scaler.transform(row))
+        timings[i] = time.perf_counter() - start
+
+    batch = X[:batch_size]
+    batch_repeats = max(repeats // 20, 3)
+    batch_timings = np.empty(batch_repeats)
+    for i in range(batch_repeats):
+        start = time.perf_counter()
+        predict(scaler.transform(batch))
+        batch_timings[i] = time.perf_counter() - start
+
+    result.update({
+        'single_p50_us': round(float(np.percentile(timings, 50)) * 1e6, 1),
+        'single_p99_us': round(float(np.percentile(timings, 99)) * 1e6, 1),
+        'batch_size': len(batch),
+        'batch_ms': round(float(np.median(batch_timings)) * 1000, 3),
+        'batch_us_per_sample': round(float(np.median(batch_timings)) / len(batch) * 1e6, 2)
+    })
+    return result
+
+
+def pareto_front(entries, metric='test_accuracy', cost='single_p50_us'):
+    """Labels of entries not dominated on (higher metric, lower cost)."""
+    front = []
+    for entry in entries:
+        dominated = any(
+            other[metric] >= entry[metric] and other[cost] <= entry[cost]
+            and (other[metric] > entry[metric] or other[cost] < entry[cost])
+            for other in entries if other is not entry
+        )
+        if not dominated:
+            front.append(entry['label'])
+    return front
+
+
+def build_report(models_dir, scaler, repeats=200, batch_size=1000, metric='test_accuracy', seed=0):
+    """Benchmark every model in models_dir; returns the report dict."""
+    X = np.random.default_rng(seed).integers(1, 11, size=(max(batch_size, repeats), 9)).astype(float)
+
+    entries = []
+    for name, model_format, path, metrics in discover_models(models_dir):
+        label = name if model_format == 'joblib' else f'{name} ({model_format})'
+        entry = {'label': label, 'model': name, 'format': model_format, 'path': path}
+        entry.update({key: metrics.get(key) for key in METRICS})
+        try:
+            entry.update(benchmark_model(model_format, path, scaler, X, repeats, batch_size))
+        except Exception as e:
+            print(f"⚠️  Could not benchmark {label}: {e}")
+            continue
+        entries.append(entry)
+
+    scored = [entry for entry in entries if entry['servable'] and entry.get(metric) is not None]
+    front = pareto_front(scored, metric)
+    for entry in entries:
+        entry['pareto'] = entry['label'] in front
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'machine': {'platform': sys.platform, 'cpu_count': os.cpu_count()},
+        'metric': metric,
+        'repeats': repeats,
+        'models': entries,
+        'pareto_front': front,
+        'recommended': recommend(entries, metric)
+    }
+
+
+def recommend(entries, metric='test_accuracy'):
+    """Most accurate servable Pareto model, fastest on ties."""
+    servable = [entry for entry in entries if entry['pareto'] and entry['servable']]
+    if not servable:
+        return None
+    return max(servable, key=lambda entry: (entry[metric], -entry['single_p50_us']))['model']
+
+
+def format_table(report):
+    header = (f"{'Model':<22} {'Acc':>6} {'F1':>6} {'AUC':>6} {'Load ms':>8} {'Mem KB':>8} "
+              f"{'p50 us':>8} {'p99 us':>8} {'Batch us/row':>12}  ")
+    lines = [header, '-' * len(header)]
+
+    def fmt(value):
+        return f'{value:.4f}' if value is not None else '-'
+
+    for entry in report['models']:
+        flags = ('*' if entry['pareto'] else ' ') + ('' if entry['servable'] else ' (no predict_proba)')
+        lines.append(
+            f"{entry['label']:<22} {fmt(entry['test_accuracy']):>6} {fmt(entry['f1_score']):>6} "
+            f"{fmt(entry['roc_auc']):>6} {entry['load_ms']:>8} {entry['memory_kb']:>8} "
+            f"{entry['single_p50_us']:>8} {entry['single_p99_us']:>8} {entry['batch_us_per_sample']:>12}  {flags}"
+        )
+    lines.append('')
+    lines.append(f"* Pareto front ({report['metric']} vs single-row p50): {', '.join(report['pareto_front'])}")
+    lines.append(f"Recommended serving model: {report['recommended']}")
+    return '\n'.join(lines)
+
+
+def select_model(report, choice):
+    """Resolve --select (a model name or 'auto') and write it to the server config."""
+    name = report['recommended'] if choice == 'auto' else choice
+    matches = [entry for entry in report['models'] if entry['model'] == name]
+    if not matches:
+        raise ValueError(f'Unknown model {name!r}')
+    if not any(entry['servable'] for entry in matches):
+        raise ValueError(f'{name} has no predict_proba and cannot be served')
+    return write_server_config({
+        'default_model': name,
+        'selected_at': datetime.now().isoformat(),
+        'selection_metric': report['metric']
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every model in Models/ and pick the serving model')
+    parser.add_argument('--models-dir', default=os.path.normpath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Models')))
+    parser.add_argument('--repeats', type=int, default=500, help='single-row predictions timed per model')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--metric', choices=METRICS, default='test_accuracy')
+    parser.add_argument('--json', metavar='PATH', default=MODEL_REPORT,
+                        help=f'where to write the full report as JSON (default {MODEL_REPORT})')
+    parser.add_argument('--select', metavar='MODEL', help="model name or 'auto' to write as the server default")
+    args = parser.parse_args()
+
+    # Benchmark through the same input scaler the server applies
+    report = build_report(args.models_dir, artifacts.build_legacy_scaler(),
+                          args.repeats, args.batch_size, args.metric)
+    print()
+    print(format_table(report))
+
+    _write_json(report, args.json)
+    print(f"📝 Report written to {args.json}")
+
+    if args.select:
+        try:
+            config = select_model(report, args.select)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"✅ Default model set to {config['default_model']} in {SERVER_CONFIG} (restart the server to apply)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
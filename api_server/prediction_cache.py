@@ -0,0 +1,341 @@
+"""
+Shared Prediction Cache
+=======================
+
+Cross-worker cache for single-sample KNN predictions.
+
+Every gunicorn worker imports ``app.py`` separately, so a plain dict cache
+would be duplicated (and cold) in each of them. This module keeps one cache
+that all workers on a host read and write:
+
+- ``shared``: a fixed-size open-addressing hash table living in a named
+  ``multiprocessing.shared_memory`` block. The 9 features (integers 1-10)
+  are packed 4 bits each into a single uint64 key.
+- ``redis``: any Redis-compatible server (requires the optional ``redis``
+  package), for setups where workers do not share a host.
+
+Entries carry the model version they were computed with and an expiry time,
+so reloading a different model invalidates the whole cache at once.
+
+Configuration (environment variables):
+
+- ``PREDICTION_CACHE``: ``off`` (default), ``shared`` or ``redis``
+- ``PREDICTION_CACHE_SLOTS``: hash table size for ``shared`` (default 65536)
+- ``PREDICTION_CACHE_TTL``: entry lifetime in seconds, 0 = no expiry (default 3600)
+- ``PREDICTION_CACHE_NAME``: shared memory block name (default ``knn_prediction_cache``)
+- ``PREDICTION_CACHE_URL``: Redis URL (default ``redis://localhost:6379/0``)
+"""
+
+import os
+import time
+import zlib
+import tempfile
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+try:
+    import fcntl
+except ImportError:  # Windows: SharedLock only locks within a process
+    fcntl = None
+
+N_FEATURES = 9
+OCCUPIED_BIT = 1 << 63
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+PROBE_WINDOW = 8
+HEADER_BYTES = 64
+
+SLOT_DTYPE = np.dtype([
+    ('key', '<u8'),
+    ('version', '<u4'),
+    ('prediction', '<u4'),
+    ('expires', '<f8'),
+    ('prob_benign', '<f8'),
+    ('prob_malignant', '<f8'),
+])
+
+# Active backend (None when caching is disabled)
+backend = None
+
+
+def pack_features(features):
+    """Pack 9 integer features in 1-10 into a uint64 key, or None if not packable."""
+    if len(features) != N_FEATURES:
+        return None
+    key = 0
+    for i, value in enumerate(features):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        if value != int(value) or not (1 <= value <= 10):
+            return None
+        key |= (int(value) - 1) << (4 * i)
+    return key
+
+
+def version_tag(model_version):
+    """Reduce a model version string to the 32-bit tag stored with each entry."""
+    return zlib.crc32(model_version.encode('utf-8'))
+
+
+def open_shared_block(name, size):
+    """Create or attach a named shared memory block that outlives this process.
+
+    The block is unregistered from the multiprocessing resource tracker,
+    otherwise the first worker to exit would unlink it under the others.
+    """
+    try:
+        block = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        block = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(block._name, 'shared_memory')
+    except Exception:
+        pass
+    if block.size < size:
+        block.close()
+        raise ValueError(f'Shared memory block {name!r} is {block.size} bytes, expected {size}')
+    return block
+
+
+class SharedLock:
+    """Thread lock plus, where fcntl exists, an flock shared by all workers.
+
+    The lock file is opened per process: flock locks belong to the open
+    file, so a descriptor inherited across fork() would not exclude anyone.
+    """
+
+    def __init__(self, name):
+        self.path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+        self._thread_lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            if self._pid != os.getpid():
+                self._file = open(self.path, 'a')
+                self._pid = os.getpid()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+def pid_alive(pid):
+    """Whether a process with this pid exists (True when it cannot be told)."""
+    try:
+        pid = int(pid)
+    except (TypeError, ValueError):
+        return True
+    if os.name == 'nt':
+        # os.kill(pid, 0) sends CTRL_C_EVENT on Windows; query the process instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() != 87  # ERROR_INVALID_PARAMETER: no such pid
+        exit_code = ctypes.c_ulong()
+        try:
+            if kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return exit_code.value == 259  # STILL_ACTIVE
+            return True
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class SharedMemoryBackend:
+    """Open-addressing hash table in a shared memory block.
+
+    Writers clear the slot key, write the payload and then publish the key;
+    readers re-check the key after copying the slot. Without a lock, a race
+    between two workers can only turn a hit into a miss, never return a
+    wrong prediction. Hit/miss counters are best-effort.
+    """
+
+    def __init__(self, name, capacity, ttl):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.version = 0
+        self.block = open_shared_block(name, HEADER_BYTES + capacity * SLOT_DTYPE.itemsize)
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype='<i8', buffer=self.block.buf)
+        self.slots = np.ndarray((capacity,), dtype=SLOT_DTYPE,
+                                buffer=self.block.buf, offset=HEADER_BYTES)
+
+    def _window(self, key):
+        start = ((key * HASH_MULTIPLIER) & MASK64) % self.capacity
+        return [(start + i) % self.capacity for i in range(PROBE_WINDOW)]
+
+    def get(self, key):
+        tagged = key | OCCUPIED_BIT
+        now = time.time()
+        for idx in self._window(tagged):
+            slot = self.slots[idx].copy()
+            if slot['key'] != tagged:
+                continue
+            if slot['version'] != self.version or slot['expires'] < now:
+                break
+            if self.slots['key'][idx] != tagged:
+                break
+            self.header[0] += 1
+            return int(slot['prediction']), float(slot['prob_benign']), float(slot['prob_malignant'])
+        self.header[1] += 1
+        return None
+
+    def put(self, key, prediction, prob_benign, prob_malignant):
+        tagged = key | OCCUPIED_BIT
+        now = time.time()
+        window = self._window(tagged)
+        target = None
+        for idx in window:
+            slot_key = self.slots['key'][idx]
+            if slot_key == 0 or slot_key == tagged:
+                target = idx
+                break
+            if self.slots['version'][idx] != self.version or self.slots['expires'][idx] < now:
+                target = idx
+                break
+        if target is None:
+            # Window full of live entries: evict the one closest to expiry
+            target = min(window, key=lambda i: self.slots['expires'][i])
+            self.header[2] += 1
+        expires = now + self.ttl if self.ttl > 0 else np.inf
+        self.slots['key'][target] = 0
+        self.slots[target] = (0, self.version, prediction, expires, prob_benign, prob_malignant)
+        self.slots['key'][target] = tagged
+
+    def stats(self):
+        hits, misses, evictions = (int(v) for v in self.header[:3])
+        lookups = hits + misses
+        return {
+            'backend': 'shared',
+            'capacity': self.capacity,
+            'ttl_seconds': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class RedisBackend:
+    """Cache entries in a Redis-compatible server.
+
+    Size eviction is left to the server's ``maxmemory-policy``; the model
+    version is part of every key, so a new model never sees old entries.
+    """
+
+    def __init__(self, url, ttl):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.version = 0
+
+    def _key(self, key):
+        return f'knn_prediction:{self.version:08x}:{key:09x}'
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        if value is None:
+            self.client.incr('knn_prediction:misses')
+            return None
+        self.client.incr('knn_prediction:hits')
+        prediction, prob_benign, prob_malignant = value.decode('ascii').split(',')
+        return int(prediction), float(prob_benign), float(prob_malignant)
+
+    def put(self, key, prediction, prob_benign, prob_malignant):
+        value = f'{int(prediction)},{float(prob_benign)!r},{float(prob_malignant)!r}'
+        if self.ttl > 0:
+            self.client.setex(self._key(key), self.ttl, value)
+        else:
+            self.client.set(self._key(key), value)
+
+    def stats(self):
+        hits = int(self.client.get('knn_prediction:hits') or 0)
+        misses = int(self.client.get('knn_prediction:misses') or 0)
+        lookups = hits + misses
+        return {
+            'backend': 'redis',
+            'ttl_seconds': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def configure(model_version):
+    """Set up the configured backend (once) and bind it to ``model_version``."""
+    global backend
+
+    if backend is None:
+        mode = os.environ.get('PREDICTION_CACHE', 'off').lower()
+        ttl = float(os.environ.get('PREDICTION_CACHE_TTL', '3600'))
+        try:
+            if mode == 'shared':
+                backend = SharedMemoryBackend(
+                    os.environ.get('PREDICTION_CACHE_NAME', 'knn_prediction_cache'),
+                    int(os.environ.get('PREDICTION_CACHE_SLOTS', '65536')),
+                    ttl
+                )
+            elif mode == 'redis':
+                backend = RedisBackend(
+                    os.environ.get('PREDICTION_CACHE_URL', 'redis://localhost:6379/0'),
+                    int(ttl)
+                )
+            elif mode != 'off':
+                print(f"⚠️  Unknown PREDICTION_CACHE mode '{mode}', cache disabled")
+        except Exception as e:
+            print(f"⚠️  Prediction cache unavailable ({mode}): {e}")
+            backend = None
+
+    if backend is not None:
+        backend.version = version_tag(model_version)
+        print(f"   🗄️  Prediction cache bound to model version {model_version}")
+
+
+def get(features):
+    """Return cached ``(prediction, prob_benign, prob_malignant)`` or None."""
+    if backend is None:
+        return None
+    key = pack_features(features)
+    if key is None:
+        return None
+    try:
+        return backend.get(key)
+    except Exception as e:
+        print(f"⚠️  Prediction cache read failed: {e}")
+        return None
+
+
+def put(features, prediction, prob_benign, prob_malignant):
+    """Store a prediction for ``features`` if they are cacheable."""
+    if backend is None:
+        return
+    key = pack_features(features)
+    if key is None:
+        return
+    try:
+        backend.put(key, int(prediction), float(prob_benign), float(prob_malignant))
+    except Exception as e:
+        print(f"⚠️  Prediction cache write failed: {e}")
+
+
+def stats():
+    """Cache statistics for the health endpoint, or None when disabled."""
+    if backend is None:
+        return None
+    try:
+        return backend.stats()
+    except Exception as e:
+        return {'error': str(e)}
@@ -0,0 +1,215 @@
+"""
+Request Profiling
+=================
+
+Opt-in, sampled stack profiling of live requests.
+
+A sampled request registers its thread with a background sampler that
+snapshots the thread's Python stack every ``PROFILE_INTERVAL_MS`` while the
+request runs. Stacks are aggregated as collapsed lines
+(``outer;inner;leaf count``), which ``flamegraph.pl`` and speedscope read
+directly. Every worker writes its counts to ``PROFILE_DIR`` and the admin
+endpoint merges the files of all workers.
+
+Nothing is installed unless ``PROFILING_ENABLED=1``: with it unset the
+request hooks are never registered, so the cost is zero. With it set, the
+sample rate is changed at runtime through ``POST /admin/profile`` (shared
+with all workers through a control file); a single request can also be
+forced with the ``X-Profile: 1`` header plus a valid ``X-Admin-Token``.
+
+Configuration (environment variables):
+
+- ``PROFILING_ENABLED``: ``1`` to install the request hooks (default 0)
+- ``PROFILE_SAMPLE_RATE``: initial fraction of requests profiled (default 0)
+- ``PROFILE_INTERVAL_MS``: stack sampling interval (default 1)
+- ``PROFILE_DIR``: where workers write stacks (default ``<tmp>/knn_profiles``)
+
+The admin token (``ADMIN_TOKEN``) is checked by ``auth.is_admin``.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import threading
+import tempfile
+from collections import Counter
+
+from flask import request, g
+
+from auth import is_admin
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL_MS', '1')) / 1000
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'knn_profiles'))
+
+CONTROL_FILE = 'control.json'
+CONTROL_CHECK_INTERVAL = 1.0
+FLUSH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_stacks = Counter()
+_profiled_threads = set()
+_wakeup = threading.Event()
+_sampler = None
+
+# Runtime settings, refreshed from the control file
+_sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+_generation = 0
+_last_control_check = 0.0
+_last_flush = 0.0
+_dirty = False
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ',')
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _sample_loop():
+    while True:
+        _wakeup.wait()
+        with _lock:
+            thread_ids = list(_profiled_threads)
+            if not thread_ids:
+                _wakeup.clear()
+                continue
+        frames = sys._current_frames()
+        collapsed = [_collapse(frames[tid]) for tid in thread_ids if tid in frames]
+        with _lock:
+            _stacks.update(collapsed)
+        time.sleep(PROFILE_INTERVAL)
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=_sample_loop, name='knn-profiler', daemon=True)
+        _sampler.start()
+
+
+def _read_control():
+    """Pick up sample rate / reset changes made through any worker."""
+    global _sample_rate, _generation, _last_control_check
+    _last_control_check = time.monotonic()
+    try:
+        with open(os.path.join(PROFILE_DIR, CONTROL_FILE)) as f:
+            control = json.load(f)
+    except (OSError, ValueError):
+        return
+    _sample_rate = float(control.get('sample_rate', _sample_rate))
+    if control.get('generation', 0) != _generation:
+        _generation = control.get('generation', 0)
+        with _lock:
+            _stacks.clear()
+
+
+def _write_atomic(path, text):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _flush():
+    """Write this worker's cumulative stack counts to its file in PROFILE_DIR."""
+    global _last_flush, _dirty
+    _last_flush = time.monotonic()
+    _dirty = False
+    with _lock:
+        lines = [f'{stack} {count}\n' for stack, count in _stacks.items()]
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    _write_atomic(os.path.join(PROFILE_DIR, f'stacks-{os.getpid()}.txt'), ''.join(lines))
+
+
+def before_request():
+    if time.monotonic() - _last_control_check > CONTROL_CHECK_INTERVAL:
+        _read_control()
+    forced = request.headers.get('X-Profile') == '1' and is_admin()
+    if not forced and (_sample_rate <= 0 or random.random() >= _sample_rate):
+        return
+    _ensure_sampler()
+    g.profiled_thread = threading.get_ident()
+    with _lock:
+        _profiled_threads.add(g.profiled_thread)
+        _wakeup.set()
+
+
+def teardown_request(exc):
+    global _dirty
+    thread_id = g.pop('profiled_thread', None)
+    if thread_id is None:
+        return
+    with _lock:
+        _profiled_threads.discard(thread_id)
+    _dirty = True
+    if time.monotonic() - _last_flush > FLUSH_INTERVAL:
+        _flush()
+
+
+def init_app(app):
+    """Install the request hooks if profiling is enabled."""
+    if not PROFILING_ENABLED:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    _read_control()
+    app.before_request(before_request)
+    app.teardown_request(teardown_request)
+    print(f"   🔥 Request profiling available (sample rate {_sample_rate})")
+
+
+def set_control(sample_rate=None, reset=False):
+    """Change the sample rate and/or clear collected stacks for all workers."""
+    global _generation
+    control = {'sample_rate': _sample_rate, 'generation': _generation}
+    try:
+        with open(os.path.join(PROFILE_DIR, CONTROL_FILE)) as f:
+            control.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    if sample_rate is not None:
+        control['sample_rate'] = min(max(float(sample_rate), 0.0), 1.0)
+    if reset:
+        control['generation'] = control.get('generation', 0) + 1
+        for path in glob.glob(os.path.join(PROFILE_DIR, 'stacks-*.txt')):
+            os.remove(path)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    _write_atomic(os.path.join(PROFILE_DIR, CONTROL_FILE), json.dumps(control))
+    _read_control()
+    return control
+
+
+def collapsed_stacks():
+    """Merge the stack files of all workers into collapsed-stack text."""
+    if _dirty:
+        _flush()
+    merged = Counter()
+    for path in glob.glob(os.path.join(PROFILE_DIR, 'stacks-*.txt')):
+        try:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        merged[stack] += int(count)
+        except (OSError, ValueError):
+            continue
+    return ''.join(f'{stack} {count}\n' for stack, count in merged.most_common())
+
+
+def status():
+    return {
+        'enabled': PROFILING_ENABLED,
+        'sample_rate': _sample_rate,
+        'interval_ms': PROFILE_INTERVAL * 1000,
+        'profile_dir': PROFILE_DIR
+    }
@@ -19,6 +19,7 @@ const CancerPredictionComponent = () => {
   const [result, setResult] = useState(null);
   const [loading, setLoading] = useState(false);
   const [modelInfo, setModelInfo] = useState(null);
+  const [explanation, setExplanation] = useState(null);
 
   const featureNames = [
     'Clump Thickness',
@@ -60,15 +61,8 @@ const CancerPredictionComponent = () => {
     setResult(null);
 
     try {
-      const response = await fetch(`${API_BASE_URL}/predict`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          features: features
-        })
-      });
+      // GET form is cacheable: repeats revalidate via ETag and get a 304 without re-running the model
+      const response = await fetch(`${API_BASE_URL}/predict?f=${features.join(',')}`);
 
       const data = await response.json();
       
@@ -87,6 +81,35 @@ const CancerPredictionComponent = () => {
     }
   };
 
+  const loadExplanation = async () => {
+    setLoading(true);
+    setExplanation(null);
+
+    try {
+      // One neighbour search returns both the prediction and the similar cases
+      const response = await fetch(`${API_BASE_URL}/predict/explain`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ features })
+      });
+
+      const data = await response.json();
+
+      if (data.status === 'success') {
+        setExplanation(data);
+      } else {
+        throw new Error(data.error || 'Explanation failed');
+      }
+    } catch (error) {
+      console.error('Explanation error:', error);
+      setExplanation({
+        error: error.message
+      });
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const loadSampleCase = (sampleType) => {
     const samples = {
       benign: [2, 1, 1, 1, 2, 1, 2, 1, 1],
@@ -95,6 +118,7 @@ const CancerPredictionComponent = () => {
     };
     setFeatures(samples[sampleType]);
     setResult(null);
+    setExplanation(null);
   };
 
   return (
@@ -188,6 +212,22 @@ const CancerPredictionComponent = () => {
         >
           {loading ? '🔄 Predicting...' : '🔍 Make Prediction'}
         </button>
+        <button
+          onClick={loadExplanation}
+          disabled={loading}
+          style={{
+            marginLeft: '10px',
+            padding: '12px 24px',
+            fontSize: '16px',
+            backgroundColor: loading ? '#ccc' : '#607D8B',
+            color: 'white',
+            border: 'none',
+            borderRadius: '4px',
+            cursor: loading ? 'not-allowed' : 'pointer'
+          }}
+        >
+          🧭 Show Similar Cases
+        </button>
       </div>
 
       {/* Results */}
@@ -252,6 +292,51 @@ const CancerPredictionComponent = () => {
           )}
         </div>
       )}
+
+      {/* Nearest training cases behind the prediction */}
+      {explanation && (
+        <div style={{ 
+          marginTop: '20px',
+          border: '1px solid #ddd', 
+          borderRadius: '8px', 
+          padding: '20px',
+          backgroundColor: explanation.error ? '#ffebee' : '#f9f9f9'
+        }}>
+          {explanation.error ? (
+            <p>❌ {explanation.error}</p>
+          ) : (
+            <div>
+              <h3>🧭 {explanation.k} Most Similar Training Cases</h3>
+              <p>
+                Prediction: <strong>{explanation.prediction.diagnosis}</strong>
+                {' '}({(explanation.prediction.confidence * 100).toFixed(1)}% of neighbours agree)
+              </p>
+              <table style={{ width: '100%', borderCollapse: 'collapse', fontSize: '14px' }}>
+                <thead>
+                  <tr>
+                    <th style={{ textAlign: 'left' }}>Case #</th>
+                    <th style={{ textAlign: 'left' }}>Diagnosis</th>
+                    <th style={{ textAlign: 'left' }}>Distance</th>
+                    <th style={{ textAlign: 'left' }}>Features</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {explanation.neighbors.map((neighbor) => (
+                    <tr key={neighbor.index}>
+                      <td>{neighbor.index}</td>
+                      <td style={{ color: neighbor.diagnosis === 'Benign' ? '#4CAF50' : '#f44336' }}>
+                        {neighbor.diagnosis}
+                      </td>
+                      <td>{neighbor.distance.toFixed(3)}</td>
+                      <td>{neighbor.features ? neighbor.features.join(', ') : '-'}</td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+        </div>
+      )}
     </div>
   );
 };
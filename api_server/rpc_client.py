@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+KNN Binary RPC Client
+=====================
+
+Client for the length-prefixed binary protocol served by ``rpc_server.py``.
+Meant for service-to-service scoring where HTTP/JSON overhead dominates the
+cost of a 9-feature prediction. Only needs numpy.
+
+Wire format (all integers big-endian):
+
+    frame    = uint32 payload_length, payload
+    request  = uint8 opcode (1 = predict), n_rows x 9 uint8 features (1-10)
+    response = uint8 status (0 = ok), n_rows x (uint8 label, float32 p_benign, float32 p_malignant)
+             | uint8 status (1 = error), utf-8 message
+
+Responses come back in request order, so a client may pipeline several
+frames on one connection before reading.
+
+Usage:
+
+    from rpc_client import RPCClient
+
+    with RPCClient('tcp://localhost:5001') as client:
+        print(client.predict([2, 1, 1, 1, 2, 1, 2, 1, 1]))
+        labels, p_benign, p_malignant = client.predict_many(rows)
+        for labels, p_benign, p_malignant in client.stream(huge_rows, chunk_size=1000):
+            ...
+"""
+
+import socket
+import struct
+from collections import deque
+
+import numpy as np
+
+OP_PREDICT = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+N_FEATURES = 9
+MAX_ROWS_PER_FRAME = 10000
+
+HEADER = struct.Struct('>I')
+RESULT_DTYPE = np.dtype([('label', 'u1'), ('prob_benign', '>f4'), ('prob_malignant', '>f4')])
+
+
+class RPCError(Exception):
+    """Raised when the server reports an error or the connection breaks."""
+
+
+def parse_address(address):
+    """Split ``tcp://host:port`` or ``unix:///path`` into (family, address)."""
+    if address.startswith('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '0.0.0.0', int(port))
+
+
+def recv_exact(sock, size):
+    """Read exactly ``size`` bytes, or return None on a clean EOF before any byte."""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            if received == 0:
+                return None
+            raise RPCError('Connection closed mid-frame')
+        received += n
+    return bytes(buf)
+
+
+def encode_rows(rows):
+    """Encode an (n, 9) array-like of integer features as a predict request payload.
+
+    An empty sequence of rows is a valid zero-row request.
+    """
+    X = np.asarray(rows)
+    if len(X) == 0:
+        return bytes([OP_PREDICT])
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.ndim != 2 or X.shape[1] != N_FEATURES:
+        raise ValueError('Rows must have 9 features each')
+    if not np.all(X == np.round(X)) or X.min() < 1 or X.max() > 10:
+        raise ValueError('Features must be integers between 1 and 10')
+    return bytes([OP_PREDICT]) + X.astype(np.uint8).tobytes()
+
+
+class RPCClient:
+    """One persistent connection to an RPC listener."""
+
+    def __init__(self, address='tcp://localhost:5001', timeout=30.0):
+        family, addr = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.connect(addr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def _send(self, payload):
+        self.sock.sendall(HEADER.pack(len(payload)) + payload)
+
+    def _receive(self):
+        header = recv_exact(self.sock, HEADER.size)
+        if header is None:
+            raise RPCError('Connection closed by server')
+        payload = recv_exact(self.sock, HEADER.unpack(header)[0]) or b''
+        if not payload or payload[0] != STATUS_OK:
+            raise RPCError(payload[1:].decode('utf-8', 'replace') or 'Empty response')
+        results = np.frombuffer(payload, dtype=RESULT_DTYPE, offset=1)
+        return (results['label'].astype(np.int64),
+                results['prob_benign'].astype(np.float64),
+                results['prob_malignant'].astype(np.float64))
+
+    def predict_many(self, rows):
+        """Predict up to MAX_ROWS_PER_FRAME rows in one round trip.
+
+        Returns (labels, prob_benign, prob_malignant) arrays.
+        """
+        self._send(encode_rows(rows))
+        return self._receive()
+
+    def predict(self, features):
+        """Predict one sample; returns a dict like the HTTP API's prediction field."""
+        labels, prob_benign, prob_malignant = self.predict_many([features])
+        label = int(labels[0])
+        return {
+            'diagnosis': 'Benign' if label == 2 else 'Malignant',
+            'confidence': round(float(max(prob_benign[0], prob_malignant[0])), 3),
+            'raw_prediction': label,
+            'probabilities': {
+                'benign': round(float(prob_benign[0]), 3),
+                'malignant': round(float(prob_malignant[0]), 3)
+            }
+        }
+
+    def stream(self, rows, chunk_size=1000, window=4):
+        """Predict an iterable of rows, pipelining up to ``window`` frames.
+
+        Yields (labels, prob_benign, prob_malignant) per chunk, in order.
+        """
+        chunk_size = min(chunk_size, MAX_ROWS_PER_FRAME)
+        pending = deque()
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                self._send(encode_rows(chunk))
+                pending.append(len(chunk))
+                chunk = []
+                if len(pending) >= window:
+                    pending.popleft()
+                    yield self._receive()
+        if chunk:
+            self._send(encode_rows(chunk))
+            pending.append(len(chunk))
+        while pending:
+            pending.popleft()
+            yield self._receive()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    address = sys.argv[1] if len(sys.argv) > 1 else 'tcp://localhost:5001'
+    with RPCClient(address) as client:
+        print(client.predict([2, 1, 1, 1, 2, 1, 2, 1, 1]))
+        print(client.predict([8, 7, 8, 7, 6, 9, 7, 8, 3]))
+
+        n = 1000
+        start = time.perf_counter()
+        for _ in range(n):
+            client.predict_many([[5, 4, 4, 5, 7, 10, 3, 2, 1]])
+        elapsed = time.perf_counter() - start
+        print(f"{n} sequential single predictions: {elapsed / n * 1e6:.0f} us each")
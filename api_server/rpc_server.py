@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+KNN Binary RPC Server
+=====================
+
+Second listener next to the Flask HTTP API for internal callers. Speaks the
+length-prefixed binary protocol documented in ``rpc_client.py`` over TCP or
+a Unix socket, keeps connections open, and scores each frame with the model
+already loaded by ``app.py`` in one vectorized call.
+
+Run standalone:
+
+    python rpc_server.py                      # tcp://127.0.0.1:5001
+    python rpc_server.py unix:///tmp/knn_rpc.sock
+
+or set ``RPC_LISTEN`` (same address syntax) to start it inside every server
+worker. The protocol is unauthenticated and bypasses the HTTP admission
+limits, so the default listens on loopback only; bind a wider address only
+on a trusted private network. TCP listeners use SO_REUSEPORT so all gunicorn workers share the
+port; a Unix socket is served by whichever worker binds it first.
+"""
+
+import os
+import sys
+import errno
+import socket
+import threading
+import traceback
+import socketserver
+
+import numpy as np
+
+from rpc_client import (
+    HEADER, N_FEATURES, MAX_ROWS_PER_FRAME, OP_PREDICT, RESULT_DTYPE,
+    STATUS_OK, STATUS_ERROR, RPCError, parse_address, recv_exact
+)
+
+DEFAULT_ADDRESS = 'tcp://127.0.0.1:5001'
+
+
+class PredictionHandler(socketserver.BaseRequestHandler):
+    """Serve frames on one connection until the client disconnects."""
+
+    def handle(self):
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                header = recv_exact(self.request, HEADER.size)
+                if header is None:
+                    return
+                length = HEADER.unpack(header)[0]
+                if length > 1 + MAX_ROWS_PER_FRAME * N_FEATURES:
+                    self._send(bytes([STATUS_ERROR]) + b'Frame too large')
+                    return
+                payload = recv_exact(self.request, length) or b''
+                self._send(self.server.respond(payload))
+            except (ConnectionError, OSError, RPCError):
+                # Client went away, possibly mid-frame
+                return
+
+    def _send(self, payload):
+        self.request.sendall(HEADER.pack(len(payload)) + payload)
+
+
+class PredictionServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def respond(self, payload):
+        """Turn one request payload into one response payload."""
+        if not payload or payload[0] != OP_PREDICT:
+            return bytes([STATUS_ERROR]) + b'Unknown opcode'
+        if (len(payload) - 1) % N_FEATURES:
+            return bytes([STATUS_ERROR]) + b'Payload is not a whole number of 9-feature rows'
+
+        X = np.frombuffer(payload, dtype=np.uint8, offset=1).reshape(-1, N_FEATURES)
+        if len(X) == 0:
+            return bytes([STATUS_OK])
+        if X.min() < 1 or X.max() > 10:
+            return bytes([STATUS_ERROR]) + b'Features must be between 1 and 10'
+
+        try:
+            predictions, prob_benign, prob_malignant = self.predict_fn(X)
+        except Exception as e:
+            traceback.print_exc()
+            return bytes([STATUS_ERROR]) + f'Prediction error: {e}'.encode('utf-8')
+
+        results = np.empty(len(X), dtype=RESULT_DTYPE)
+        results['label'] = predictions
+        results['prob_benign'] = prob_benign
+        results['prob_malignant'] = prob_malignant
+        return bytes([STATUS_OK]) + results.tobytes()
+
+
+class TCPPredictionServer(PredictionServerMixin, socketserver.ThreadingTCPServer):
+    def server_bind(self):
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class UnixPredictionServer(PredictionServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+def _remove_stale_socket(path):
+    """Delete a Unix socket file nobody is listening on any more."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    except OSError:
+        pass
+    finally:
+        probe.close()
+
+
+def create_server(address, predict_fn):
+    """Bind a prediction server on ``address`` (tcp://host:port or unix:///path)."""
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        _remove_stale_socket(addr)
+        server = UnixPredictionServer(addr, PredictionHandler)
+    else:
+        server = TCPPredictionServer(addr, PredictionHandler)
+    server.predict_fn = predict_fn
+    return server
+
+
+def start_in_background(address, predict_fn):
+    """Start a listener thread in this process; returns the server or None."""
+    try:
+        server = create_server(address, predict_fn)
+    except OSError as e:
+        if e.errno == errno.EADDRINUSE:
+            print(f"ℹ️  RPC listener {address} already served by another worker")
+        else:
+            print(f"⚠️  Could not start RPC listener on {address}: {e}")
+        return None
+    thread = threading.Thread(target=server.serve_forever, name='knn-rpc', daemon=True)
+    thread.start()
+    print(f"🔌 RPC listener on {address}")
+    return server
+
+
+def main():
+    address = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('RPC_LISTEN', DEFAULT_ADDRESS)
+
+    # This process is the listener; keep app.py from starting a second one
+    os.environ.pop('RPC_LISTEN', None)
+    import app
+    if not app.model_loaded:
+        print("❌ Failed to load model. RPC server not started.")
+        return 1
+
+    server = create_server(address, app.predict_matrix)
+    print(f"🚀 KNN RPC server listening on {address}")
+    print("Press Ctrl+C to stop the server")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
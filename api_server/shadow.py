@@ -0,0 +1,231 @@
+"""
+Shadow Scoring
+==============
+
+Evaluates candidate models from ``Models/`` against the live predictions of
+the serving (primary) model without touching the request path.
+
+Request handlers call ``submit()`` with the feature vectors they served and
+the primary model's predictions they returned. A sampled copy is put on a bounded
+in-memory queue (dropped, never blocking, when the queue is full); a
+background thread drains it in batches, scores each batch with every
+candidate model in one vectorized call and accumulates, per model:
+
+- samples scored and agreement with the primary model
+- disagreements in each direction (candidate says malignant where the
+  primary said benign, and the reverse)
+- scoring time
+
+Totals are written to a SQLite file shared by all gunicorn workers and
+served by ``GET /shadow/stats``. Rows are keyed by the primary model version
+as well as the candidate, so agreement measured against an earlier primary
+(another model or version) is never added to the current one.
+
+Configuration (environment variables):
+
+- ``SHADOW_MODELS``: comma-separated model names, e.g.
+  ``Random Forest,SVM RBF,Logistic Regression`` (default empty = disabled)
+- ``SHADOW_SAMPLE_RATE``: fraction of served samples shadowed (default 0.1)
+- ``SHADOW_QUEUE_SIZE``: max queued submissions per worker (default 10000)
+- ``SHADOW_BATCH_SIZE``: samples per scoring batch (default 256)
+- ``SHADOW_FLUSH_SECONDS``: max wait before scoring a partial batch (default 2)
+- ``SHADOW_DB``: SQLite file (default ``<tmp>/knn_shadow.sqlite3``)
+"""
+
+import os
+import time
+import queue
+import random
+import sqlite3
+import threading
+import tempfile
+import traceback
+from datetime import datetime
+
+import numpy as np
+import joblib
+
+SHADOW_MODELS = [name.strip() for name in os.environ.get('SHADOW_MODELS', '').split(',') if name.strip()]
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', '0.1'))
+SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', '10000'))
+SHADOW_BATCH_SIZE = int(os.environ.get('SHADOW_BATCH_SIZE', '256'))
+SHADOW_FLUSH_SECONDS = float(os.environ.get('SHADOW_FLUSH_SECONDS', '2'))
+SHADOW_DB = os.environ.get('SHADOW_DB', os.path.join(tempfile.gettempdir(), 'knn_shadow.sqlite3'))
+
+_queue = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+_candidates = {}
+_scaler = None
+_primary_version = None
+_worker = None
+_dropped = 0
+_active = False
+
+
+def _connect():
+    connection = sqlite3.connect(SHADOW_DB, timeout=5)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS shadow_results (
+            primary_version TEXT NOT NULL,
+            model TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            agreements INTEGER NOT NULL,
+            false_malignant INTEGER NOT NULL,
+            false_benign INTEGER NOT NULL,
+            batches INTEGER NOT NULL,
+            score_seconds REAL NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (primary_version, model)
+        )
+    """)
+    return connection
+
+
+def _load_candidates(models_dir):
+    """Load the joblib file of every configured candidate model."""
+    for name in SHADOW_MODELS:
+        files = sorted(
+            filename for filename in os.listdir(models_dir)
+            if filename.startswith(f'{name}_') and filename.endswith('.joblib')
+        )
+        if not files:
+            print(f"⚠️  Shadow model '{name}' not found in {models_dir}")
+            continue
+        try:
+            _candidates[name] = joblib.load(os.path.join(models_dir, files[-1]))
+        except Exception as e:
+            print(f"⚠️  Could not load shadow model '{name}': {e}")
+
+
+def _record(name, samples, agreements, false_malignant, false_benign, seconds, connection):
+    connection.execute("""
+        INSERT INTO shadow_results VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT(primary_version, model) DO UPDATE SET
+            samples = samples + excluded.samples,
+            agreements = agreements + excluded.agreements,
+            false_malignant = false_malignant + excluded.false_malignant,
+            false_benign = false_benign + excluded.false_benign,
+            batches = batches + 1,
+            score_seconds = score_seconds + excluded.score_seconds,
+            updated_at = excluded.updated_at
+    """, (_primary_version, name, samples, agreements, false_malignant, false_benign, seconds,
+          datetime.now().isoformat()))
+
+
+def _score_batch(X, primary, connection):
+    X_scaled = _scaler.transform(X)
+    for name, candidate in _candidates.items():
+        start = time.perf_counter()
+        predictions = candidate.predict(X_scaled)
+        elapsed = time.perf_counter() - start
+        _record(
+            name,
+            len(X),
+            int(np.sum(predictions == primary)),
+            int(np.sum((predictions == 4) & (primary == 2))),
+            int(np.sum((predictions == 2) & (primary == 4))),
+            elapsed,
+            connection
+        )
+    connection.commit()
+
+
+def _run(models_dir):
+    global _active
+    _load_candidates(models_dir)
+    if not _candidates:
+        _active = False
+        return
+    print(f"   👥 Shadow scoring: {', '.join(_candidates)}")
+    connection = _connect()
+
+    while True:
+        rows, labels, count = [], [], 0
+        deadline = time.monotonic() + SHADOW_FLUSH_SECONDS
+        while count < SHADOW_BATCH_SIZE:
+            try:
+                X, primary = _queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                if count:
+                    break
+                deadline = time.monotonic() + SHADOW_FLUSH_SECONDS
+                continue
+            rows.append(X)
+            labels.append(primary)
+            count += len(X)
+        try:
+            _score_batch(np.concatenate(rows), np.concatenate(labels), connection)
+        except Exception:
+            traceback.print_exc()
+
+
+def init_shadow(models_dir, scaler, primary_version):
+    """Start the background scorer if SHADOW_MODELS is configured."""
+    global _scaler, _worker, _active, _primary_version
+    _scaler = scaler
+    _primary_version = primary_version
+    if not SHADOW_MODELS or SHADOW_SAMPLE_RATE <= 0 or _worker is not None:
+        return
+    _active = True
+    # Candidates are loaded on the scorer thread so startup is not delayed
+    _worker = threading.Thread(target=_run, args=(models_dir,), name='knn-shadow', daemon=True)
+    _worker.start()
+
+
+def submit(samples, predictions):
+    """Queue a sampled copy of served samples for shadow scoring. Never blocks."""
+    global _dropped
+    if not _active:
+        return
+    try:
+        X = np.asarray(samples, dtype=float).reshape(-1, 9)
+        primary = np.asarray(predictions).reshape(-1)
+    except (TypeError, ValueError):
+        return
+    if len(X) == 1:
+        if random.random() >= SHADOW_SAMPLE_RATE:
+            return
+    else:
+        mask = np.random.random(len(X)) < SHADOW_SAMPLE_RATE
+        if not mask.any():
+            return
+        X, primary = X[mask], primary[mask]
+    try:
+        _queue.put_nowait((X, primary))
+    except queue.Full:
+        _dropped += 1
+
+
+def stats():
+    """Aggregated shadow results from all workers against the current primary."""
+    models = []
+    if os.path.exists(SHADOW_DB):
+        connection = _connect()
+        try:
+            rows = connection.execute(
+                'SELECT model, samples, agreements, false_malignant, false_benign, '
+                'batches, score_seconds, updated_at FROM shadow_results '
+                'WHERE primary_version = ? ORDER BY model', (_primary_version,)
+            ).fetchall()
+        finally:
+            connection.close()
+        for name, samples, agreements, false_malignant, false_benign, batches, seconds, updated_at in rows:
+            models.append({
+                'model': name,
+                'samples': samples,
+                'agreement_rate': round(agreements / samples, 4) if samples else None,
+                'malignant_where_primary_benign': false_malignant,
+                'benign_where_primary_malignant': false_benign,
+                'batches': batches,
+                'mean_batch_ms': round(seconds / batches * 1000, 3) if batches else None,
+                'mean_us_per_sample': round(seconds / samples * 1e6, 3) if samples else None,
+                'updated_at': updated_at
+            })
+    return {
+        'enabled': _active,
+        'primary_version': _primary_version,
+        'configured_models': SHADOW_MODELS,
+        'sample_rate': SHADOW_SAMPLE_RATE,
+        'queued': _queue.qsize(),
+        'dropped': _dropped,
+        'models': models
+    }
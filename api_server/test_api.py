@@ -9,6 +9,8 @@ Simple test client to verify the KNN API server is working correctly.
 import requests
 import json
 import time
+import gzip
+import math
 
 # API base URL
 BASE_URL = "http://localhost:5000"
@@ -131,6 +133,196 @@ def test_batch_prediction():
         print(f"   ❌ Error: {e}")
         return False
 
+def test_cached_prediction():
+    """Test GET /predict with ETag revalidation."""
+    print("\n🔍 Testing Cached Prediction...")
+    try:
+        url = f"{BASE_URL}/predict?f=2,1,1,1,2,1,2,1,1"
+        
+        response = requests.get(url)
+        print(f"   Status: {response.status_code} (expected 200)")
+        if response.status_code != 200:
+            print(f"   ❌ Error: {response.text}")
+            return False
+        
+        etag = response.headers.get('ETag')
+        print(f"   ETag: {etag}")
+        print(f"   Cache-Control: {response.headers.get('Cache-Control')}")
+        print(f"   Diagnosis: {response.json()['prediction']['diagnosis']}")
+        
+        # Revalidating with the same ETag must not re-run the model
+        response = requests.get(url, headers={"If-None-Match": etag})
+        print(f"   Revalidate: {response.status_code} (expected 304)")
+        
+        return etag is not None and response.status_code == 304
+        
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return False
+
+def test_explain_prediction():
+    """Test /predict/explain for a single sample and a batch."""
+    print("\n🔍 Testing Explained Prediction...")
+    try:
+        response = requests.post(
+            f"{BASE_URL}/predict/explain",
+            json={"features": [2, 1, 1, 1, 2, 1, 2, 1, 1]}
+        )
+        print(f"   Single status: {response.status_code} (expected 200)")
+        if response.status_code != 200:
+            print(f"   ❌ Error: {response.text}")
+            return False
+        
+        data = response.json()
+        k = data['k']
+        print(f"   Diagnosis: {data['prediction']['diagnosis']} (k={k})")
+        for neighbor in data['neighbors']:
+            print(f"   Neighbor #{neighbor['index']}: {neighbor['diagnosis']} (distance {neighbor['distance']})")
+        single_ok = len(data['neighbors']) == k
+        
+        payload = {
+            "samples": [
+                [2, 1, 1, 1, 2, 1, 2, 1, 1],  # Benign
+                [8, 7, 8, 7, 6, 9, 7, 8, 3]   # Malignant
+            ]
+        }
+        response = requests.post(f"{BASE_URL}/predict/explain", json=payload)
+        print(f"   Batch status: {response.status_code} (expected 200)")
+        if response.status_code != 200:
+            print(f"   ❌ Error: {response.text}")
+            return False
+        
+        results = response.json()['results']
+        for result in results:
+            print(f"   Sample {result['sample_index']}: {result['diagnosis']} ({len(result['neighbors'])} neighbors)")
+        batch_ok = len(results) == 2 and all(len(result['neighbors']) == k for result in results)
+        
+        return single_ok and batch_ok
+        
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return False
+
+def test_compressed_columnar_batch():
+    """Test a gzip request body and compressed columnar batch response."""
+    print("\n🔍 Testing Compressed Columnar Batch...")
+    try:
+        # Large enough for the response to pass COMPRESS_MIN_BYTES
+        samples = [
+            [2, 1, 1, 1, 2, 1, 2, 1, 1],  # Benign
+            [8, 7, 8, 7, 6, 9, 7, 8, 3]   # Malignant
+        ] * 100
+        body = gzip.compress(json.dumps({"samples": samples}).encode('utf-8'))
+        print(f"   Request: {len(samples)} samples, {len(body)} bytes gzipped")
+        
+        response = requests.post(
+            f"{BASE_URL}/predict/batch?format=columnar",
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "Accept-Encoding": "gzip"
+            }
+        )
+        print(f"   Status: {response.status_code} (expected 200)")
+        if response.status_code != 200:
+            print(f"   ❌ Error: {response.text}")
+            return False
+        
+        # requests decompresses the body; the header shows how it was sent
+        encoding = response.headers.get('Content-Encoding')
+        print(f"   Content-Encoding: {encoding} (expected gzip)")
+        
+        data = response.json()
+        predictions = data['results']['raw_prediction']
+        print(f"   Format: {data['format']}, {len(predictions)} predictions")
+        print(f"   First two: {predictions[:2]} (expected [2, 4])")
+        
+        return (encoding == 'gzip' and data['format'] == 'columnar'
+                and len(predictions) == len(samples) and predictions[:2] == [2, 4])
+        
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return False
+
+def test_batch_job():
+    """Test background batch job endpoints."""
+    print("\n🔍 Testing Batch Job...")
+    try:
+        payload = {
+            "samples": [
+                [2, 1, 1, 1, 2, 1, 2, 1, 1],  # Benign
+                [8, 7, 8, 7, 6, 9, 7, 8, 3]   # Malignant
+            ]
+        }
+        
+        response = requests.post(f"{BASE_URL}/jobs", json=payload)
+        print(f"   Status: {response.status_code} (expected 202)")
+        if response.status_code != 202:
+            print(f"   ❌ Error: {response.text}")
+            return False
+        
+        job_id = response.json()['job']['job_id']
+        print(f"   Job ID: {job_id}")
+        
+        # Poll until the job finishes
+        for _ in range(20):
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()['job']
+            print(f"   State: {job['state']} ({job['processed_samples']}/{job['total_samples']})")
+            if job['state'] in ('completed', 'failed'):
+                break
+            time.sleep(0.5)
+        
+        data = requests.get(f"{BASE_URL}/jobs/{job_id}/results").json()
+        for result in data['results']:
+            print(f"   Sample {result['sample_index']}: {result['diagnosis']}")
+        
+        return job['state'] == 'completed' and len(data['results']) == 2
+        
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return False
+
+def test_admission_limits():
+    """Test 413 for oversized batches and 429 once the rate limit is spent."""
+    print("\n🔍 Testing Admission Limits...")
+    try:
+        limits = requests.get(f"{BASE_URL}/").json()['admission']
+        max_batch = limits['max_batch_size']
+        burst = limits['rate_limit_burst']
+        print(f"   Max batch: {max_batch}, burst: {burst}, rate: {limits['rate_limit_per_second']}/s")
+        sample = [2, 1, 1, 1, 2, 1, 2, 1, 1]
+        
+        response = requests.post(f"{BASE_URL}/predict/batch", json={"samples": [sample] * (max_batch + 1)})
+        print(f"   Oversized batch: {response.status_code} (expected 413)")
+        too_large_ok = response.status_code == 413
+        
+        # Made-up API keys and X-Forwarded-For prefixes must not buy fresh buckets
+        attempts = math.ceil(burst / max_batch) + 2
+        for i in range(attempts):
+            response = requests.post(
+                f"{BASE_URL}/predict/batch",
+                json={"samples": [sample] * max_batch},
+                headers={"X-API-Key": f"fake-key-{i}", "X-Forwarded-For": f"10.0.0.{i}"}
+            )
+            print(f"   Batch {i + 1}: {response.status_code}")
+            if response.status_code == 429:
+                break
+        
+        retry_after = response.headers.get('Retry-After')
+        print(f"   Rate limited: {response.status_code} (expected 429), Retry-After: {retry_after}")
+        rate_limited_ok = response.status_code == 429 and retry_after is not None
+        
+        # Let the bucket refill so later requests are not rejected
+        if rate_limited_ok:
+            time.sleep(int(retry_after))
+        
+        return too_large_ok and rate_limited_ok
+        
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+        return False
+
 def test_error_cases():
     """Test error handling."""
     print("\n🔍 Testing Error Cases...")
@@ -188,7 +380,12 @@ def main():
         ("Health Check", test_health_check),
         ("Model Info", test_model_info),
         ("Single Prediction", test_single_prediction),
-        ("Batch Prediction", test_batch_prediction)
+        ("Batch Prediction", test_batch_prediction),
+        ("Cached Prediction", test_cached_prediction),
+        ("Explained Prediction", test_explain_prediction),
+        ("Compressed Columnar Batch", test_compressed_columnar_batch),
+        ("Batch Job", test_batch_job),
+        ("Admission Limits", test_admission_limits)
     ]
     
     results = []